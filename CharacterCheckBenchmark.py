@@ -0,0 +1,325 @@
+from argparse import ArgumentParser
+from asyncio import run
+from pathlib import Path
+from itertools import product
+from tempfile import TemporaryDirectory
+from io import BytesIO
+from time import perf_counter
+import csv
+import json
+import os
+import platform
+import shutil
+import sys
+import threading
+import tracemalloc
+
+from CharacterCheckGUI import (FileHandler, available_encodings, parsing_engines, string_storages, DEFAULT_ENCODING,
+                               DEFAULT_CHAR_TO_CHECK, DEFAULT_STRING_STORAGE, DEFAULT_CHUNK_SIZE, get_byte_dialect,
+                               read_csv_header_bytes, count_chars_in_byte_range, validate_byte_range)
+# installed by CharacterCheckGUI if they are missing
+import pandas as pd
+import numpy as np
+import pyarrow
+
+### Benchmark of the FileHandler. Generates synthetic csv files and times loading, analyzing, swapping and exporting them
+### for every combination of parsing engine, chunk size and string storage. The results are written to .json or .csv,
+### so runs on different versions or machines can be compared.
+###
+### python CharacterCheckBenchmark.py --rows 1000000 --engines c mmap --chunk-sizes 10000 50000 --output bench.json
+
+ASCII_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 '
+# added to the values if the encoding can encode them, so multibyte and non ascii bytes are part of the files as well
+EXTRA_CHARS = 'äöüßéñ€'
+SWAP_IN = '@$@$@'
+# seconds between two looks at the memory allocated by arrow during a step
+ARROW_MEMORY_INTERVAL = 0.005
+# files the byte scanner has to split into the same records and values as pandas, checked with --check-scanner
+SCANNER_CASES = {
+    'stray_quote': b'a,b,c\n1,5" screen,3\n4,5,6\n7,8,9\n10,11,12\n',
+    'text_after_closing_quote': b'a,b,c\n1,"x"y"z",3\n"4,5"6,7,8\n',
+    'escaped_quotes': b'a,b,c\n1,"x ""y"", z",3\n"4",",",""""\n"""",""",""",6\n',
+    'crlf': b'a,b,c\r\n1,"x,\r\ny",3\r\n4,5" a,6\r\n',
+    'blank_lines': b'a,b,c\n\n1,2,3\n\n\n4,"5\n\n,6",7\n\n',
+}
+SCANNER_CHECK_CHARS = [',', '"']
+
+
+def get_alphabet(encoding: str) -> list:
+    """Returns the characters the values are made of, all of them can be encoded with encoding."""
+    alphabet = list(ASCII_CHARS)
+    for char in EXTRA_CHARS:
+        try:
+            char.encode(encoding)
+        except UnicodeEncodeError:
+            continue
+        alphabet.append(char)
+    return alphabet
+
+
+def generate_column(rng: np.random.Generator, rows: int, field_length: int, alphabet: list, densities: dict
+                    ) -> np.ndarray:
+    """Returns the values of one column. The length of a value is uniform between 0 and 2 * field_length, so the mean
+    is field_length. densities is {char: share of the values which contain char once}."""
+    width = max(2 * field_length, 1)
+    codes = np.array([ord(char) for char in alphabet], dtype=np.uint32)[rng.integers(0, len(alphabet), (rows, width))]
+    lengths = rng.integers(0, width + 1, rows)
+    for char, density in densities.items():
+        if density <= 0:
+            continue
+        # the character replaces one random position of the value
+        rows_with_char = np.flatnonzero((rng.random(rows) < density) & (lengths > 0))
+        positions = rng.integers(0, lengths[rows_with_char])
+        codes[rows_with_char, positions] = ord(char)
+    # numpy cuts trailing NUL characters off unicode strings, everything behind the length of a value is set to NUL
+    codes[np.arange(width) >= lengths[:, None]] = 0
+    return codes.view(f'<U{width}').ravel()
+
+
+def generate_csv(path: Path, rows: int, columns: int, field_length: int, encoding: str, separator: str,
+                 char_density: float, quote_density: float, newline_density: float, seed: int) -> Path:
+    """Writes a synthetic csv file. char_density, quote_density and newline_density are the share of values containing
+    the check character, a quote char and a line break. Values with separators, quotes or line breaks are quoted the
+    way to_csv does it."""
+    rng = np.random.default_rng(seed)
+    alphabet = get_alphabet(encoding)
+    densities = {DEFAULT_CHAR_TO_CHECK: char_density, '"': quote_density, '\n': newline_density}
+    dataframe = pd.DataFrame({f"column_{k}": generate_column(rng, rows, field_length, alphabet, densities)
+                              for k in range(columns)})
+    # to_csv writes \n line ends even on windows, the same bytes on every platform
+    dataframe.to_csv(path, sep=separator, encoding=encoding, index=False, lineterminator='\n')
+    return path
+
+
+def measure(function, *args, trace_memory: bool = False) -> dict:
+    """Runs function(*args) and returns the wall time in seconds. With trace_memory also the peaks of the memory
+    allocated in the meantime: by python and numpy, by arrow and both together. tracemalloc does not see the arrow
+    buffers of the pyarrow string storage, their peak is sampled every ARROW_MEMORY_INTERVAL seconds. The two peaks
+    can be at different moments, so their sum is an upper bound. Tracing slows the run down a lot, its time is not
+    comparable to the one of an untraced run."""
+    if not trace_memory:
+        start = perf_counter()
+        run(function(*args))
+        return {'seconds': round(perf_counter() - start, 4), 'traced': False}
+    arrow_start = pyarrow.total_allocated_bytes()
+    arrow_peak = arrow_start
+    done = threading.Event()
+
+    def sample_arrow_memory():
+        nonlocal arrow_peak
+        while not done.wait(ARROW_MEMORY_INTERVAL):
+            arrow_peak = max(arrow_peak, pyarrow.total_allocated_bytes())
+
+    sampler = threading.Thread(target=sample_arrow_memory, daemon=True)
+    tracemalloc.start()
+    sampler.start()
+    start = perf_counter()
+    try:
+        run(function(*args))
+        seconds = perf_counter() - start
+        python_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        done.set()
+        sampler.join()
+        tracemalloc.stop()
+    # one more look at the end, for steps shorter than the interval
+    arrow_peak = max(arrow_peak, pyarrow.total_allocated_bytes()) - arrow_start
+    return {
+        'seconds': round(seconds, 4),
+        'traced': True,
+        'peak_python_bytes': python_peak,
+        'peak_arrow_bytes': arrow_peak,
+        'peak_memory_bytes': python_peak + arrow_peak,
+    }
+
+
+def configure_handler(file_handler: FileHandler, file_path: Path, case: dict) -> None:
+    file_handler.set_file_path(str(file_path))
+    file_handler.set_encoding(case['encoding'])
+    file_handler.seperator = case['separator']
+    file_handler.parsing_engine = case['engine']
+    file_handler.chunk_size = case['chunk_size']
+    file_handler.string_storage = case['string_storage']
+    file_handler.use_cache = False # we want to measure the work, not the cache
+    file_handler.check_char_user_input = DEFAULT_CHAR_TO_CHECK
+    file_handler.update_check_values_and_regex()
+
+
+def reset_results(file_handler: FileHandler) -> None:
+    """Forgets counted characters, so every analysis counts again."""
+    file_handler.char_matches = {}
+    file_handler.char_matches_key = None
+
+
+def benchmark_case(file_path: Path, case: dict, export_dir: Path, options: dict) -> list:
+    """Runs the steps of one case on the file and returns one result per step. The steps depend on each other, the
+    analysis needs the loaded dataframe and the export the transformed one. The mmap engine only changes the analysis
+    of the file on disk (the byte scanner), it loads, analyzes dataframes and exports like the c engine, so it only
+    gets that step. The memory is traced in one more run after the timed ones."""
+    file_handler = FileHandler('', '') # the singleton is reset by __init__
+    configure_handler(file_handler, file_path, case)
+    if case['engine'] == 'mmap':
+        steps = [('analyze_streaming', file_handler.analyze_file_streaming)]
+    else:
+        steps = [
+            ('load', file_handler.set_dataframe_from_filepath),
+            ('analyze', file_handler.analyze_dataframe),
+            ('transform', lambda: file_handler.transform_df(DEFAULT_CHAR_TO_CHECK, SWAP_IN)),
+            ('export', lambda: file_handler.export_file(str(export_dir), case['separator'])),
+        ]
+        if options['streaming']:
+            steps += [
+                ('analyze_streaming', file_handler.analyze_file_streaming),
+                ('export_streaming', lambda: file_handler.export_file_streaming(
+                    str(export_dir), case['separator'], DEFAULT_CHAR_TO_CHECK, SWAP_IN)),
+            ]
+    results = []
+    for step, function in steps:
+        runs = []
+        for trace_memory in [False] * options['repeat'] + [True] * options['trace_memory']:
+            if step.startswith('analyze'):
+                reset_results(file_handler)
+            runs.append(measure(function, trace_memory=trace_memory))
+            if step.startswith('export'):
+                # export_file refuses to overwrite, a repetition within the same second would fail
+                for exported in export_dir.iterdir():
+                    exported.unlink()
+        timed = [r for r in runs if not r['traced']]
+        traced = next((r for r in runs if r['traced']), {})
+        best = min(timed, key=lambda result: result['seconds'])
+        results.append({
+            **case,
+            'step': step,
+            'seconds': best['seconds'],
+            'rows_per_second': round(file_handler.dataframe_length / best['seconds']) if best['seconds'] else None,
+            **{key: traced.get(key) for key in ('peak_memory_bytes', 'peak_python_bytes', 'peak_arrow_bytes')},
+            'rows': file_handler.dataframe_length,
+            'matching_rows': sum(count for count, _ in file_handler.cols_with_char.values()),
+            'runs': [r['seconds'] for r in timed],
+        })
+    file_handler.drop_df_and_reset_handler()
+    return results
+
+
+def check_byte_scanner() -> list:
+    """Counts SCANNER_CHECK_CHARS in SCANNER_CASES with the byte scanner of the mmap engine and with pd.read_csv and
+    returns the names of the cases where the rows, the matching rows or the occurances differ, or where the validation
+    counts other records than pandas."""
+    dialect = get_byte_dialect('utf_8', ',')
+    patterns = [char.encode('utf_8') for char in SCANNER_CHECK_CHARS]
+    failed = []
+    for name, data in SCANNER_CASES.items():
+        expected = pd.read_csv(BytesIO(data), dtype=str, keep_default_na=False)
+        _, field_indices, data_start = read_csv_header_bytes(data, 'utf_8', dialect, 0, False)
+        rows, matches = count_chars_in_byte_range(data, data_start, len(data), dialect, field_indices, patterns, False)
+        counted = [[(len(matches[i][j][0]), matches[i][j][2]) for j in range(len(patterns))] for i in field_indices]
+        parsed = [[(int(expected[column].str.contains(char, regex=False).sum()),
+                    int(expected[column].str.count(char).sum())) for char in SCANNER_CHECK_CHARS]
+                  for column in expected.columns]
+        validated = validate_byte_range(data, data_start, len(data), dialect, len(field_indices))['records']
+        if rows != len(expected) or validated != len(expected) or counted != parsed:
+            failed.append(name)
+    return failed
+
+
+def get_environment() -> dict:
+    """Versions and machine the benchmark ran on, results of different machines are not comparable."""
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'pyarrow': pyarrow.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def write_results(results: list, options: dict, output_path: Path) -> None:
+    """Writes the results as .json together with the settings and the environment, or as .csv with one line per
+    case and step."""
+    if output_path.suffix.lower() == '.csv':
+        columns = ['file', 'encoding', 'engine', 'chunk_size', 'string_storage', 'step', 'seconds', 'rows_per_second',
+                   'peak_memory_bytes', 'peak_python_bytes', 'peak_arrow_bytes', 'rows', 'matching_rows',
+                   'file_size_bytes']
+        with open(output_path, 'w', encoding='utf_8', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(output_path, 'w', encoding='utf_8') as file:
+            json.dump({'environment': get_environment(), 'options': options, 'results': results}, file, indent=2,
+                      ensure_ascii=False)
+
+
+def parse_arguments(argv: list) -> dict:
+    parser = ArgumentParser(description="Benchmarks loading, analyzing, swapping and exporting synthetic csv files.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000], help="rows of the generated files")
+    parser.add_argument('--columns', type=int, default=10, help="columns of the generated files (default: 10)")
+    parser.add_argument('--field-length', type=int, default=20, help="mean length of the values (default: 20)")
+    parser.add_argument('--char-density', type=float, default=0.05,
+                        help=f"share of values containing '{DEFAULT_CHAR_TO_CHECK}' (default: 0.05)")
+    parser.add_argument('--quote-density', type=float, default=0.01,
+                        help="share of values containing a quote char (default: 0.01)")
+    parser.add_argument('--newline-density', type=float, default=0.001,
+                        help="share of values containing a line break (default: 0.001)")
+    parser.add_argument('--separator', default=';', help="separator of the generated files (default: ';')")
+    parser.add_argument('--encodings', nargs='+', default=[DEFAULT_ENCODING], choices=available_encodings,
+                        metavar='ENCODING', help=f"encodings of the generated files (default: {DEFAULT_ENCODING})")
+    parser.add_argument('--engines', nargs='+', default=parsing_engines, choices=parsing_engines,
+                        help="parsing engines to benchmark (default: all)")
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[DEFAULT_CHUNK_SIZE],
+                        help=f"chunk sizes to benchmark (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument('--string-storages', nargs='+', default=[DEFAULT_STRING_STORAGE], choices=string_storages,
+                        help=f"string storages to benchmark (default: {DEFAULT_STRING_STORAGE})")
+    parser.add_argument('--streaming', action='store_true', help="also benchmark the streaming analysis and export")
+    parser.add_argument('--repeat', type=int, default=1, help="timed runs per step, the fastest one is reported")
+    parser.add_argument('--no-memory', dest='trace_memory', action='store_false',
+                        help="do not measure the memory, which takes one more run per step")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the generated files (default: 0)")
+    parser.add_argument('--work-dir', default=None,
+                        help="directory for the generated files and exports (default: a temporary directory)")
+    parser.add_argument('--output', default='character_check_benchmark.json',
+                        help="results file, .json or .csv (default: character_check_benchmark.json)")
+    parser.add_argument('--check-scanner', action='store_true',
+                        help="only check that the byte scanner reads quotes, line ends and blank lines like pandas")
+    return vars(parser.parse_args(argv))
+
+
+def main(argv: list = None) -> int:
+    options = parse_arguments(sys.argv[1:] if argv is None else argv)
+    if options['check_scanner']:
+        failed = check_byte_scanner()
+        print(f"Byte scanner differs from pandas on: {', '.join(failed)}" if failed
+              else f"Byte scanner matches pandas on all {len(SCANNER_CASES)} cases.")
+        return 1 if failed else 0
+    results = []
+    with TemporaryDirectory() as temp_dir:
+        work_dir = Path(options['work_dir'] or temp_dir)
+        export_dir = work_dir / 'export'
+        export_dir.mkdir(parents=True, exist_ok=True)
+        for rows, encoding in product(options['rows'], options['encodings']):
+            file_path = work_dir / f"synthetic_{rows}_{options['columns']}_{encoding}_{options['seed']}.csv"
+            if not file_path.exists():
+                # the same settings and seed give the same file, it is reused by later runs on a work dir
+                print(f"Generating {file_path.name}")
+                generate_csv(file_path, rows, options['columns'], options['field_length'], encoding,
+                             options['separator'], options['char_density'], options['quote_density'],
+                             options['newline_density'], options['seed'])
+            for engine, chunk_size, string_storage in product(options['engines'], options['chunk_sizes'],
+                                                              options['string_storages']):
+                case = {'file': file_path.name, 'file_size_bytes': file_path.stat().st_size, 'encoding': encoding,
+                        'separator': options['separator'], 'engine': engine, 'chunk_size': chunk_size,
+                        'string_storage': string_storage}
+                for result in benchmark_case(file_path, case, export_dir, options):
+                    print(f"{result['file']} {engine} chunk_size={chunk_size} {string_storage} {result['step']}: "
+                          f"{result['seconds']}s")
+                    results.append(result)
+        shutil.rmtree(export_dir, ignore_errors=True)
+    write_results(results, options, Path(options['output']))
+    print(f"Results written to {options['output']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+from argparse import ArgumentParser
+from asyncio import run
+from pathlib import Path
+from glob import glob
+import concurrent.futures
+import csv
+import json
+import os
+import sys
+
+from CharacterCheckGUI import (FileHandler, available_encodings, parsing_engines, string_storages, export_formats,
+                               DEFAULT_ENCODING, DEFAULT_CHAR_TO_CHECK, DEFAULT_PARSING_ENGINE, DEFAULT_STRING_STORAGE,
+                               DEFAULT_EXPORT_FORMAT, DEFAULT_CHUNK_SIZE)
+
+### Command line version of CharacterCheckGUI for batch runs without a display. Checks many csv files for one (or more)
+### characters, optionally swaps a string and re-exports the files, and writes a report of the per column counts as
+### .json or .csv. Every file is handled in its own worker process, the FileHandler is a singleton per process.
+###
+### python CharacterCheckCLI.py feeds/*.csv --chars ", ;" --report report.json --workers 8
+
+# lines of the bad records in the .json report of the validation, the rest is only counted
+REPORTED_BAD_LINES = 100
+
+
+def collect_files(inputs: list, pattern: str) -> list:
+    """Expands the inputs to a sorted list of files. An input can be a file, a directory (all files matching pattern
+    within it) or a glob."""
+    files = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            files.update(str(f) for f in path.glob(pattern) if f.is_file())
+        elif path.is_file():
+            files.add(str(path))
+        else:
+            files.update(f for f in glob(item, recursive=True) if Path(f).is_file())
+    return sorted(files)
+
+
+def configure_handler(file_handler: FileHandler, file_path: str, options: dict) -> None:
+    """Sets the options of the command line on the handler, the way the ui binds its inputs to it."""
+    file_handler.set_file_path(file_path)
+    file_handler.set_encoding(options['encoding'])
+    file_handler.seperator = options['separator']
+    file_handler.toggle_header_mode(options['header'])
+    file_handler.supress_unnamed_columns = options['supress_unnamed_columns']
+    file_handler.replace_linebreaks = options['replace_linebreaks']
+    file_handler.parsing_engine = options['engine']
+    file_handler.string_storage = options['string_storage']
+    file_handler.chunk_size = options['chunk_size']
+    file_handler.streaming_mode = options['streaming']
+    file_handler.use_cache = options['use_cache']
+    file_handler.metrics_log_path = options['metrics_log']
+    file_handler.export_format = options['export_format']
+    file_handler.check_char_user_input = options['chars']
+    file_handler.update_check_values_and_regex()
+
+
+async def check_file(file_handler: FileHandler, options: dict) -> None:
+    """Load, analyze and the optional swap and export, like the buttons of the ui do it."""
+    if options['detect']:
+        await file_handler.detect_file_format()
+    if options['validate']:
+        await file_handler.validate_file()
+    keep_file_on_disk = file_handler.streaming_mode or file_handler.parsing_engine == 'mmap'
+    if keep_file_on_disk:
+        await file_handler.analyze_file_streaming()
+    else:
+        await file_handler.set_dataframe_from_filepath()
+        await file_handler.analyze_dataframe()
+    if options['export_dir'] is not None:
+        if keep_file_on_disk:
+            await file_handler.export_file_streaming(options['export_dir'], options['export_separator'],
+                                                     options['swap_out'], options['swap_in'])
+        else:
+            await file_handler.transform_df(options['swap_out'], options['swap_in'])
+            await file_handler.export_file(options['export_dir'], options['export_separator'])
+
+
+def get_validation_report(file_handler: FileHandler) -> dict:
+    """The summary of the validation and the lines of the first bad records, None if the file was not validated."""
+    if not file_handler.validation:
+        return None
+    bad_lines = file_handler.get_flagged_rows(page_size=REPORTED_BAD_LINES)
+    return {**file_handler.validation, 'bad_lines': bad_lines[['line', 'fields', 'issues']].to_dict('records')}
+
+
+def process_file(file_path: str, options: dict) -> dict:
+    """Runs in the worker processes. Returns the result of one file for the report, errors are reported instead of
+    raised so one broken file does not stop the batch."""
+    result = {'file': file_path, 'encoding': None, 'separator': None, 'header': None, 'rows': None, 'columns': [],
+              'validation': None, 'stages': [], 'error': None}
+    file_handler = FileHandler('', '') # the singleton is reset by __init__
+
+    def keep_finished_stage(metrics):
+        if metrics['done']:
+            result['stages'].append(metrics)
+
+    try:
+        configure_handler(file_handler, file_path, options)
+        file_handler.metrics_callbacks.append(keep_finished_stage)
+        run(check_file(file_handler, options))
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        # the validation tells why pandas could not parse the file
+        result['validation'] = get_validation_report(file_handler)
+        return result
+    result['validation'] = get_validation_report(file_handler)
+    result['encoding'] = file_handler.encoding
+    result['separator'] = file_handler.seperator
+    result['header'] = file_handler.file_header is not None
+    result['rows'] = file_handler.dataframe_length
+    # a list instead of a dict, json would turn int column names of files without header into strings
+    for col, (count, percentage) in file_handler.cols_with_char.items():
+        result['columns'].append({
+            'column': col,
+            'rows': count,
+            'percentage': percentage,
+            'chars': {char: {'rows': rows, 'occurances': occurances}
+                      for char, (rows, occurances) in file_handler.char_counts[col].items()},
+        })
+    file_handler.drop_df_and_reset_handler()
+    return result
+
+
+def write_report(results: list, report_path: Path) -> None:
+    """Writes the results as .json, or as .csv with one line per file, column and character. The metrics of the stages
+    are only part of the .json."""
+    if report_path.suffix.lower() == '.csv':
+        with open(report_path, 'w', encoding='utf_8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['file', 'rows', 'column', 'char', 'rows_with_char', 'occurances', 'percentage_of_rows',
+                             'error'])
+            for result in results:
+                if result['error'] is not None or not result['columns']:
+                    writer.writerow([result['file'], result['rows'], '', '', '', '', '', result['error'] or ''])
+                for col in result['columns']:
+                    for char, counts in col['chars'].items():
+                        writer.writerow([result['file'], result['rows'], col['column'], char, counts['rows'],
+                                         counts['occurances'], col['percentage'], ''])
+    else:
+        with open(report_path, 'w', encoding='utf_8') as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+
+
+def parse_arguments(argv: list) -> dict:
+    parser = ArgumentParser(description="Checks csv files for characters which collide with the separator.")
+    parser.add_argument('inputs', nargs='+', help="csv files, directories or globs (quote globs to use ** patterns)")
+    parser.add_argument('--pattern', default='*.csv', help="files to pick from directories (default: *.csv)")
+    parser.add_argument('--chars', default=DEFAULT_CHAR_TO_CHECK,
+                        help="characters to check for, separated by a space (default: ',')")
+    parser.add_argument('--encoding', default=DEFAULT_ENCODING, choices=available_encodings, metavar='ENCODING',
+                        help=f"file encoding (default: {DEFAULT_ENCODING})")
+    parser.add_argument('--separator', default=',', help="csv separator (default: ',')")
+    parser.add_argument('--no-header', dest='header', action='store_false', help="the files have no header row")
+    parser.add_argument('--detect', action='store_true',
+                        help="detect encoding, separator and header of every file, overrides the options above")
+    parser.add_argument('--keep-unnamed', dest='supress_unnamed_columns', action='store_false',
+                        help="do not supress unnamed columns")
+    parser.add_argument('--keep-linebreaks', dest='replace_linebreaks', action='store_false',
+                        help="do not delete line breaks within values")
+    parser.add_argument('--engine', default=DEFAULT_PARSING_ENGINE, choices=parsing_engines,
+                        help=f"csv parsing engine (default: {DEFAULT_PARSING_ENGINE})")
+    parser.add_argument('--string-storage', default=DEFAULT_STRING_STORAGE, choices=string_storages,
+                        help=f"storage of the loaded values, pyarrow needs less memory (default: {DEFAULT_STRING_STORAGE})")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"rows per chunk when reading with pandas (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument('--streaming', action='store_true', help="do not keep the files in memory")
+    parser.add_argument('--validate', action='store_true',
+                        help="check the files for ragged rows, unbalanced quotes and line breaks within values")
+    parser.add_argument('--cache', dest='use_cache', action='store_true',
+                        help="keep parsed files and analysis results in the on disk cache and reuse them")
+    parser.add_argument('--export-dir', default=None, help="swap the string and export the files to this directory")
+    parser.add_argument('--swap-out', default=DEFAULT_CHAR_TO_CHECK, help="string to swap out (default: ',')")
+    parser.add_argument('--swap-in', default='@$@$@', help="string to swap in (default: '@$@$@')")
+    parser.add_argument('--export-separator', default=DEFAULT_CHAR_TO_CHECK, help="separator of the exported files")
+    parser.add_argument('--export-format', default=DEFAULT_EXPORT_FORMAT, choices=export_formats,
+                        help=f"format of the exported files (default: {DEFAULT_EXPORT_FORMAT})")
+    parser.add_argument('--metrics-log', default=None,
+                        help="append the metrics of every load, analysis and export to this file as json lines")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument('--report', default='character_check_report.json',
+                        help="report file, .json or .csv (default: character_check_report.json)")
+    return vars(parser.parse_args(argv))
+
+
+def main(argv: list = None) -> int:
+    options = parse_arguments(sys.argv[1:] if argv is None else argv)
+    files = collect_files(options['inputs'], options['pattern'])
+    if not files:
+        print("No files found.", file=sys.stderr)
+        return 1
+    if options['export_dir'] is not None:
+        Path(options['export_dir']).mkdir(parents=True, exist_ok=True)
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(options['workers'], len(files))) as pool:
+        futures = {pool.submit(process_file, file_path, options): file_path for file_path in files}
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            status = result['error'] or f"{result['rows']} rows, {len(result['columns'])} columns with matches"
+            print(f"{result['file']}: {status}")
+            results.append(result)
+    # the report is in the order of the files, not in the order the workers finished
+    results.sort(key=lambda result: files.index(result['file']))
+    write_report(results, Path(options['report']))
+    print(f"Report written to {options['report']}")
+    return 1 if any(result['error'] is not None for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
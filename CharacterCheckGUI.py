@@ -1,10 +1,30 @@
-from re import escape
+from re import escape, findall
 from pathlib import Path
+from functools import lru_cache, wraps, partial
+from contextlib import asynccontextmanager
+import codecs
+import gzip
+import mmap
 from subprocess import check_call
 from sys import executable, exit
 import concurrent.futures
-from asyncio import sleep, get_running_loop
+from asyncio import sleep, get_running_loop, wait, Lock
+from io import BytesIO, StringIO
+import os
+import json
+import shutil
+from hashlib import sha1
 from datetime import datetime
+from itertools import repeat
+from array import array
+from time import perf_counter
+from statistics import NormalDist
+from collections import Counter, deque
+import unicodedata
+import csv
+import logging
+import threading
+from zipfile import BadZipFile
 
 ### This script allows the user to check all values within a .csv file for one (or more) characters. The script shows
 ### the number of occurances within the columns of the csv and allows the user to preview 10 rows to get an idea of the
@@ -24,37 +44,1357 @@ try:
 except ImportError:
     install('pandas')
     import pandas as pd
+# numpy is a dependency of pandas, so it is available whenever pandas is.
+import numpy as np
 
 try:
-    import webview
+    # the resident memory of the process, the same on windows, macos and linux
+    import psutil
 except ImportError:
-    install('pywebview')
-    import webview
+    install('psutil')
+    import psutil
 
 try:
-    from nicegui import ui, app
+    # pandas needs pyarrow to read and write the feather files of the cache and for arrow backed string columns
+    import pyarrow
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
 except ImportError:
-    install('nicegui')
-    from nicegui import ui, app
+    install('pyarrow')
+    import pyarrow
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
 
 # list with available encodings for pandas.read_csv().
 available_encodings = ['ascii','big5','big5hkscs','cp037','cp273','cp424','cp437','cp500','cp720','cp737','cp775','cp850','cp852','cp855','cp856','cp857','cp858','cp860','cp861','cp862','cp863','cp864','cp865','cp866','cp869','cp874','cp875','cp932','cp949','cp950','cp1006','cp1026','cp1125','cp1140','cp1250','cp1251','cp1252','cp1253','cp1254','cp1255','cp1256','cp1257','cp1258','euc_jp','euc_jis_2004','euc_jisx0213','euc_kr','gb2312','gbk','gb18030','hz','iso2022_jp','iso2022_jp_1','iso2022_jp_2','iso2022_jp_2004','iso2022_jp_3','iso2022_jp_ext','iso2022_kr','latin_1','iso8859_2','iso8859_3','iso8859_4','iso8859_5','iso8859_6','iso8859_7','iso8859_8','iso8859_9','iso8859_10','iso8859_11','iso8859_13','iso8859_14','iso8859_15','iso8859_16','johab','koi8_r','koi8_t','koi8_u','kz1048','mac_cyrillic','mac_greek','mac_iceland','mac_latin2','mac_roman','mac_turkish','ptcp154','shift_jis','shift_jis_2004','shift_jisx0213','utf_32','utf_32_be','utf_32_le','utf_16','utf_16_be','utf_16_le','utf_7','utf_8','utf_8_sig']
 
-parsing_engines = ['c', 'python']
+parsing_engines = ['c', 'python', 'mmap']
 DEFAULT_PARSING_ENGINE = 'c'
-
-# we are doing lookups later on using regex (within pd.df.replace) and need to escape these chars if the user wants
-# to search for them.
-characters_to_escape_in_regex = ['.', '+', '*', '?', '^', '$', '(', ')', '[', ']', '{', '}', '|', '\\']
+# the mmap engine does not parse the file with pandas, it counts the characters on the raw bytes. this only works if one
+# byte is one character (or for utf_8, where bytes of multibyte characters never look like ascii characters).
+BYTE_SCANNER_UTF8_ENCODINGS = ['utf_8', 'utf_8_sig']
+UTF8_BOM = codecs.BOM_UTF8
+BYTE_SCANNER_BLOCK_SIZE = 16 * 1024 * 1024
+# deleted from the values if the user chooses to replace line breaks
+LINEBREAK_SUBSTITUTIONS = [('\n', ''), ('\r', '')]
+# 'python' keeps every value as a str object, 'pyarrow' stores the values of a column in one contiguous arrow buffer,
+# which takes a fraction of the memory and is searched and replaced by the vectorized arrow string kernels.
+string_storages = ['python', 'pyarrow']
+DEFAULT_STRING_STORAGE = 'python'
+# export targets: the compressed csv are written as one gzip member or zstd frame per chunk, parquet as one row group
+# per chunk and feather as one record batch per chunk
+export_formats = ['csv', 'csv.gz', 'csv.zst', 'parquet', 'feather']
+DEFAULT_EXPORT_FORMAT = 'csv'
+EXPORT_COMPRESSION = {'csv.gz': 'gzip', 'csv.zst': 'zstd', 'parquet': 'zstd', 'feather': 'zstd'}
 
 
 DEFAULT_ENCODING = 'latin_1'
 DEFAULT_CHAR_TO_CHECK = ','
 DEFAULT_FILE_HEADER_NR = 0
 DEFAULT_DF_HEAD = 10
+# rows per chunk when pandas reads, analyzes or exports the file chunk by chunk
+DEFAULT_CHUNK_SIZE = 50000
+# parsed files and analysis results are cached on disk, the least recently used entries are removed above the size cap
+CACHE_DIR = Path.home() / '.character_check_cache'
+CACHE_MAX_BYTES = 20 * 1024 ** 3
+# quick scan: records are sampled at random byte offsets, the match percentages are estimated with wilson intervals
+sample_methods = ['stratified', 'random']
+DEFAULT_SAMPLE_SIZE = 10000
+DEFAULT_CONFIDENCE = 0.95
+# a sampled line is moved on this often if its field count shows it is no record start
+SAMPLE_ALIGN_ATTEMPTS = 5
+# longer records are taken as a misaligned start within a quoted value and skipped
+SAMPLE_MAX_RECORD_BYTES = 1024 * 1024
+# format detection: the head, middle and tail of the file are decoded with the candidate encodings (in order of
+# preference) and split with the candidate separators
+SNIFF_SAMPLE_BYTES = 3 * 64 * 1024
+SNIFF_ENCODINGS = ['utf_8', 'cp1252', 'latin_1', 'iso8859_15', 'cp1250', 'cp1251', 'cp1253', 'cp1254', 'cp850',
+                   'mac_roman', 'shift_jis', 'euc_kr', 'gb18030', 'big5']
+SNIFF_SEPARATORS = [',', ';', '\t', '|', ':']
+# BOMs tell the encoding for sure, the parts after the head are decoded with the codec of the byte order
+SNIFF_BOMS = [(codecs.BOM_UTF32_LE, 'utf_32', 'utf_32_le'), (codecs.BOM_UTF32_BE, 'utf_32', 'utf_32_be'),
+              (codecs.BOM_UTF8, 'utf_8_sig', 'utf_8'), (codecs.BOM_UTF16_LE, 'utf_16', 'utf_16_le'),
+              (codecs.BOM_UTF16_BE, 'utf_16', 'utf_16_be')]
+# structural validation: the issues of a flagged record are bit flags
+RECORD_RAGGED = 1 # another field count than the header (or the first record)
+RECORD_UNBALANCED_QUOTES = 2 # odd number of quotes, the record swallows the lines up to the next quote
+RECORD_EMBEDDED_NEWLINE = 4 # a quoted value contains line breaks, valid csv but worth knowing
+RECORD_STRAY_QUOTE = 8 # a quote within an unquoted value or behind a closing quote, pandas keeps it in the value
+RECORD_ISSUES = {RECORD_RAGGED: 'ragged', RECORD_UNBALANCED_QUOTES: 'unbalanced quotes',
+                 RECORD_EMBEDDED_NEWLINE: 'embedded newline', RECORD_STRAY_QUOTE: 'stray quote'}
+# records which pandas can't parse into the columns, previewed and exported as bad rows
+BAD_RECORD_ISSUES = RECORD_RAGGED | RECORD_UNBALANCED_QUOTES
+# flagged records are shown and exported up to this length, unbalanced quotes can make a record run on for megabytes
+VALIDATION_MAX_RECORD_BYTES = 64 * 1024
+# metrics of the finished stages are appended to this file as json lines if the user turns logging on
+METRICS_LOG_FILE = Path.home() / 'character_check_metrics.jsonl'
+# seconds between two looks at the memory of the process while a stage runs
+MEMORY_SAMPLE_INTERVAL = 0.05
 WINDOW_WIDTH = 500
 WINDOW_HEIGHT = 800
 
+
+log = logging.getLogger('CharacterCheck')
+
+
+def get_string_dtype(string_storage: str):
+    """Returns the dtype for read_csv of the string storage chosen by the user."""
+    if string_storage == 'pyarrow':
+        return pd.StringDtype('pyarrow')
+    return str
+
+
+def is_arrow_string(column: pd.Series) -> bool:
+    """Checks if the values of the column are stored in an arrow string array."""
+    return isinstance(column.dtype, pd.StringDtype) and column.dtype.storage == 'pyarrow'
+
+
+def count_chars_in_column(column: pd.Series, check_chars: list) -> dict:
+    """Counting engine for the analysis. Counts the literal check characters within the values of a column without
+    regex, astype or filtered copies of the data. Returns for each character the positions of the rows containing it
+    and the total number of occurances."""
+    char_matches = {}
+    if is_arrow_string(column):
+        # the arrow kernel counts on the string buffer of the column, no python objects are created
+        values = pyarrow.array(column.array)
+        for char in check_chars:
+            counts = pc.fill_null(pc.count_substring(values, char), 0).to_numpy()
+            char_matches[char] = (np.flatnonzero(counts), int(counts.sum()))
+        return char_matches
+    # missing values can't contain anything, we count them as empty strings.
+    values = column.to_numpy(dtype=object, na_value='')
+    for char in check_chars:
+        # str.count runs in C over each value, one pass over the column per character
+        counts = np.fromiter(map(str.count, values, repeat(char)), dtype=np.int64, count=len(values))
+        char_matches[char] = (np.flatnonzero(counts), int(counts.sum()))
+    return char_matches
+
+
+def combine_char_matches(char_matches: dict, check_chars: list) -> tuple:
+    """Combines the per character results {char: {column: (positions, occurances, offsets)}} of the check characters
+    into the per column results: the rows with any of the characters, the (rows, occurances) per character and the
+    match index of row positions and record offsets. The offsets are None if a character was counted without them."""
+    row_counts = {}
+    char_counts = {}
+    match_index = {}
+    match_offsets = {}
+    has_offsets = all(offsets is not None for char in check_chars for _, _, offsets in char_matches[char].values())
+    columns = list(dict.fromkeys(col for char in check_chars for col in char_matches[char]))
+    for col in columns:
+        positions = [char_matches[char][col][0] for char in check_chars if col in char_matches[char]]
+        positions = np.concatenate(positions)
+        # a row matching several characters is only one row of the column, np.unique also sorts the positions
+        match_index[col], first_seen = np.unique(positions, return_index=True)
+        if has_offsets:
+            offsets = np.concatenate([char_matches[char][col][2] for char in check_chars if col in char_matches[char]])
+            match_offsets[col] = offsets[first_seen]
+        row_counts[col] = len(match_index[col])
+        char_counts[col] = {char: (len(char_matches[char][col][0]), char_matches[char][col][1])
+                            if col in char_matches[char] else (0, 0) for char in check_chars}
+    return row_counts, char_counts, match_index, match_offsets if has_offsets else None
+
+
+def get_substitutions(replace_linebreaks: bool, char_out: str = None, char_in: str = None) -> list:
+    """Returns the literal substitutions (old, new) of the cleanup: deleting line breaks within values and swapping
+    char_out for char_in. They are applied in this order."""
+    substitutions = list(LINEBREAK_SUBSTITUTIONS) if replace_linebreaks else []
+    if char_out: # an empty string would be found between all characters
+        substitutions.append((char_out, char_in))
+    return substitutions
+
+
+def substitute_in_column(column: pd.Series, substitutions: list) -> pd.Series:
+    """Applies the substitutions in order to the values of the column, while the column is at hand. Arrow columns are
+    replaced by the arrow kernel on the whole buffer, otherwise str.replace is mapped over the values in C. str.replace
+    hands back the same string if there is nothing to replace, so values without matches cost next to nothing."""
+    if is_arrow_string(column):
+        for old, new in substitutions:
+            column = column.str.replace(old, new, regex=False)
+        return column
+    missing = column.isna().to_numpy()
+    values = column.to_numpy(dtype=object, na_value='')
+    for old, new in substitutions:
+        values = list(map(str.replace, values, repeat(old), repeat(new)))
+    result = pd.Series(values, index=column.index, name=column.name, dtype=column.dtype)
+    if missing.any():
+        # the missing values were replaced as empty strings, they are put back as they were
+        result[missing] = column[missing]
+    return result
+
+
+def apply_substitutions(dataframe: pd.DataFrame, substitutions: list) -> pd.DataFrame:
+    """Returns a copy of the dataframe with the literal substitutions (old, new) applied in order to all values, column
+    by column instead of one regex replace over the whole frame per substitution."""
+    substitutions = [(old, new) for old, new in substitutions if old]
+    if not substitutions:
+        return dataframe.copy()
+    result = dataframe.copy(deep=False)
+    # by position, the column names do not have to be unique
+    for k in range(len(dataframe.columns)):
+        result.isetitem(k, substitute_in_column(dataframe.iloc[:, k], substitutions))
+    return result
+
+
+@lru_cache(maxsize=None)
+def is_single_byte_encoding(encoding: str) -> bool:
+    """Checks if every byte decodes to exactly one character on its own, i.e. the encoding has no multibyte sequences
+    or shift states."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    for byte in range(256):
+        decoder.reset()
+        if len(decoder.decode(bytes([byte]))) != 1:
+            return False
+    return True
+
+
+def get_byte_dialect(encoding: str, separator: str) -> dict:
+    """Encodes the structural characters of the csv (separator, quote char and line ends) for the byte scanner."""
+    # the utf_8_sig codec puts a BOM in front of everything it encodes, the characters themselves are plain utf_8.
+    if encoding in BYTE_SCANNER_UTF8_ENCODINGS:
+        encoding = 'utf_8'
+    return {
+        'sep': separator.encode(encoding),
+        'quote': '"'.encode(encoding),
+        'newline': '\n'.encode(encoding),
+        'cr': '\r'.encode(encoding),
+    }
+
+
+def get_byte_patterns(encoding: str, check_chars: list) -> list:
+    """Encodes the check characters for the byte scanner."""
+    if encoding in BYTE_SCANNER_UTF8_ENCODINGS:
+        encoding = 'utf_8'
+    return [char.encode(encoding) for char in check_chars]
+
+
+def can_split_bytes(encoding: str, separator: str) -> bool:
+    """Checks if the records of the file can be found on the raw bytes, which is the case when the separator, quote char
+    and line ends are single bytes which can't be part of a multibyte character."""
+    if encoding not in BYTE_SCANNER_UTF8_ENCODINGS and not is_single_byte_encoding(encoding):
+        return False
+    try:
+        dialect = get_byte_dialect(encoding, separator)
+    except UnicodeEncodeError:
+        return False
+    return all(len(token) == 1 for token in dialect.values())
+
+
+def can_scan_bytes(encoding: str, separator: str, check_chars: list) -> bool:
+    """Checks if the file can be analyzed by the byte scanner, which is the case when the records can be split on the
+    raw bytes and the check characters can be searched for as bytes."""
+    if not can_split_bytes(encoding, separator):
+        return False
+    try:
+        get_byte_patterns(encoding, check_chars)
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def is_field_quote_open(piece: bytes, quote: bytes, open_quote: bool = False) -> bool:
+    """Tells if a quoted field is still open after piece, the bytes of a field up to the next separator or line end.
+    piece starts at the start of the field, or within its quoted value if open_quote. Like in pandas and the csv module
+    only a quote at the start of a field opens a quoted value; within it "" is an escaped quote and any other quote
+    closes it. All other quotes, e.g. in 5" screen or behind the closing quote, are part of the value."""
+    if not open_quote:
+        if not piece.startswith(quote):
+            return False
+        piece = piece[1:]
+    # pairs are escaped quotes, a quote left over closes the value
+    return quote not in piece.replace(quote + quote, b'')
+
+
+def is_quote_open(text: bytes, dialect: dict, open_quote: bool = False) -> bool:
+    """Tells if a quoted field is open at the end of text, which starts at the start of a field, or within a quoted
+    value if open_quote."""
+    sep, quote = dialect['sep'], dialect['quote']
+    if quote not in text:
+        return open_quote
+    for piece in text.split(sep):
+        open_quote = is_field_quote_open(piece, quote, open_quote)
+    return open_quote
+
+
+def find_literal_quotes(block: bytes, dialect: dict) -> np.ndarray:
+    """Returns the positions of the quotes within block which are part of a value instead of opening or closing a
+    quoted value, see is_field_quote_open. block has to start at the beginning of a record.
+
+    A run of quotes decides on its own: at the start of a field it opens a value which an odd run keeps open, within a
+    value an odd run closes it, anywhere else it is literal. In well formed files every run which is not within a value
+    by the count of the quotes in front of it starts a field, then the count is right and nothing has to be walked."""
+    quote = dialect['quote']
+    if quote not in block:
+        return np.empty(0, dtype=np.int64)
+    data = np.frombuffer(block, dtype=np.uint8)
+    quotes = np.flatnonzero(data == quote[0])
+    first_quotes = np.flatnonzero(np.diff(quotes, prepend=-2) != 1)
+    run_lengths = np.diff(first_quotes, append=len(quotes))
+    run_starts = quotes[first_quotes]
+    previous = data[np.maximum(run_starts - 1, 0)]
+    at_field_start = ((run_starts == 0) | (previous == dialect['sep'][0]) | (previous == dialect['newline'][0]))
+    misplaced = np.flatnonzero((first_quotes % 2 == 0) & ~at_field_start)
+    if len(misplaced) == 0:
+        return np.empty(0, dtype=np.int64)
+    # the runs in front of the first misplaced one are counted right, from there on they are walked one by one
+    literal = []
+    open_quote = False
+    for first, length, field_start in zip(first_quotes[misplaced[0]:].tolist(), run_lengths[misplaced[0]:].tolist(),
+                                          at_field_start[misplaced[0]:].tolist()):
+        if open_quote:
+            open_quote = length % 2 == 0
+        elif field_start:
+            open_quote = length % 2 == 1
+        else:
+            literal.extend(range(first, first + length))
+    return quotes[literal]
+
+
+def mask_literal_quotes(block: bytes, dialect: dict) -> bytes:
+    """Returns block with its literal quotes (see find_literal_quotes) replaced by another byte, so the quotes left
+    can be counted to know which separators and line ends are within quoted values. The positions stay the same, block
+    itself is returned if there are no literal quotes."""
+    literal = find_literal_quotes(block, dialect)
+    if len(literal) == 0:
+        return block
+    data = np.frombuffer(block, dtype=np.uint8).copy()
+    data[literal] = 0 if dialect['sep'] != b'\x00' else 1
+    return data.tobytes()
+
+
+def find_record_end(block: bytes, dialect: dict) -> int:
+    """Returns the position after the last line end in block which is not within a quoted field, -1 if there is none.
+    block has to start at the beginning of a record."""
+    newline, quote = dialect['newline'], dialect['quote']
+    block = mask_literal_quotes(block, dialect)
+    quotes_in_front = block.count(quote)
+    segment_end = len(block)
+    cut = block.rfind(newline)
+    while cut != -1:
+        # an even number of quotes in front of the line end means no quoted field is open there
+        quotes_in_front -= block.count(quote, cut, segment_end)
+        if quotes_in_front % 2 == 0:
+            return cut + len(newline)
+        segment_end = cut
+        cut = block.rfind(newline, 0, cut)
+    return -1
+
+
+def iter_csv_blocks(buffer, start: int, end: int, dialect: dict):
+    """Yields (offset, block) for blocks of about BYTE_SCANNER_BLOCK_SIZE bytes between the byte offsets start and end,
+    which both have to be record boundaries. Every block consists of whole records. buffer can be bytes or an mmap."""
+    pos = start
+    while pos < end:
+        block_end = min(pos + BYTE_SCANNER_BLOCK_SIZE, end)
+        block = buffer[pos:block_end]
+        if block_end < end:
+            cut = find_record_end(block, dialect)
+            # no record boundary within the block, read on. broken files with unbalanced quotes would end up as a
+            # single block, so we give up on the quotes after a few blocks and cut at the last line end.
+            while cut == -1 and block_end < end:
+                block_end = min(block_end + BYTE_SCANNER_BLOCK_SIZE, end)
+                block = buffer[pos:block_end]
+                if len(block) > 8 * BYTE_SCANNER_BLOCK_SIZE:
+                    # a record without any line end in front of it is read on, cutting it would split the record
+                    cut = block.rfind(dialect['newline'])
+                    if cut != -1:
+                        cut += len(dialect['newline'])
+                else:
+                    cut = find_record_end(block, dialect)
+            if cut > 0:
+                block = block[:cut]
+        yield pos, block
+        pos += len(block)
+
+
+def iter_block_records(block: bytes, block_offset: int, dialect: dict):
+    """Yields (offset, record) for every record within a block. A record is a line without its line end, or several
+    lines if a quoted field contains line breaks."""
+    newline, quote = dialect['newline'], dialect['quote']
+    lines = block.split(newline)
+    if block.endswith(newline):
+        lines.pop() # split leaves an empty string after the last line end
+    # the quotes are counted without the literal ones, the records are cut from the lines of the block
+    structure = mask_literal_quotes(block, dialect)
+    structure_lines = lines if structure is block else structure.split(newline)
+    offset = block_offset
+    record = None # record which continues on the next line
+    record_offset = block_offset
+    quote_count = 0
+    for line, structure_line in zip(lines, structure_lines):
+        if record is None:
+            record = line
+            record_offset = offset
+            quote_count = structure_line.count(quote)
+        else:
+            record += newline + line
+            quote_count += structure_line.count(quote)
+        offset += len(line) + len(newline)
+        # an odd number of quotes means a quoted field is still open and the line break is part of the value
+        if quote_count % 2 == 0:
+            yield record_offset, record
+            record = None
+    if record is not None:
+        # unbalanced quotes, the record runs to the end of the block
+        yield record_offset, record
+
+
+def iter_csv_records(buffer, start: int, end: int, dialect: dict):
+    """Yields (offset, record) for every record between the byte offsets start and end."""
+    for block_offset, block in iter_csv_blocks(buffer, start, end, dialect):
+        yield from iter_block_records(block, block_offset, dialect)
+
+
+def split_csv_record(record: bytes, dialect: dict) -> list:
+    """Splits a record into its raw fields. Separators within quoted fields are not split on."""
+    sep, quote, cr = dialect['sep'], dialect['quote'], dialect['cr']
+    if record.endswith(cr):
+        record = record[:-1]
+    fields = record.split(sep)
+    if quote not in record:
+        return fields
+    # glue the pieces of quoted fields back together, a field is complete once its quoted value is closed
+    merged = []
+    current = None
+    open_quote = False
+    for piece in fields:
+        current = piece if not open_quote else current + sep + piece
+        open_quote = is_field_quote_open(piece, quote, open_quote)
+        if not open_quote:
+            merged.append(current)
+    if open_quote:
+        merged.append(current)
+    return merged
+
+
+def unquote_field(field: bytes, dialect: dict) -> bytes:
+    """Returns the value of a raw field the way pandas reads it: a quoted value without its quotes and with escaped
+    ("") quotes unescaped, followed by whatever is behind the closing quote. Quotes of unquoted fields are kept."""
+    quote = dialect['quote']
+    if not field.startswith(quote):
+        return field
+    pos = field.find(quote, 1)
+    while pos != -1:
+        if field[pos + 1:pos + 2] != quote:
+            return field[1:pos].replace(quote + quote, quote) + field[pos + 1:]
+        pos = field.find(quote, pos + 2)
+    # unbalanced, the value runs to the end of the field
+    return field[1:].replace(quote + quote, quote)
+
+
+def read_csv_header_bytes(buffer, encoding: str, dialect: dict, header, supress_unnamed_columns: bool) -> tuple:
+    """Reads the column names the way pd.read_csv names them. Returns the column names, the field index of each column
+    and the byte offset of the first data record."""
+    start = len(UTF8_BOM) if encoding in BYTE_SCANNER_UTF8_ENCODINGS and buffer[:len(UTF8_BOM)] == UTF8_BOM else 0
+    for offset, record in iter_csv_records(buffer, start, len(buffer), dialect):
+        if record in (b'', dialect['cr']):
+            continue # blank lines are skipped like in pandas
+        fields = split_csv_record(record, dialect)
+        if header is None:
+            # without a header pandas numbers the columns, the first record already is data
+            return list(range(len(fields))), list(range(len(fields))), offset
+        columns = []
+        field_indices = []
+        seen = {}
+        for i, field in enumerate(fields):
+            name = unquote_field(field, dialect).decode(encoding if encoding != 'utf_8_sig' else 'utf_8')
+            if name == '':
+                name = f"Unnamed: {i}"
+            # duplicate column names are mangled to name.1, name.2, ...
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            if supress_unnamed_columns and name.startswith('Unnamed:'):
+                continue
+            columns.append(name)
+            field_indices.append(i)
+        return columns, field_indices, offset + len(record) + len(dialect['newline'])
+    return [], [], len(buffer)
+
+
+def block_has_blank_lines(block: bytes, dialect: dict) -> bool:
+    """Checks for empty lines, which pandas skips and which therefore are no records."""
+    newline, cr = dialect['newline'], dialect['cr']
+    return (newline + newline in block or newline + cr + newline in block or block.startswith(newline)
+            or block.startswith(cr + newline))
+
+
+def count_chars_in_byte_range(buffer, start: int, end: int, dialect: dict, field_indices: list, patterns: list,
+                              replace_linebreaks: bool, progress=None) -> tuple:
+    """Byte scanner version of count_chars_in_column. Counts the byte patterns within the fields of all records between
+    the byte offsets start and end. Returns the number of records and for each field index and pattern the
+    [row numbers (counted from start), byte offsets of the records, occurances] of the matching records. progress is
+    called with the bytes and records of every block once it is scanned."""
+    sep, quote, newline, cr = dialect['sep'], dialect['quote'], dialect['newline'], dialect['cr']
+    row_count = 0
+    # arrays of 64 bit ints instead of lists, so the index stays small when a column matches in most rows
+    matches = {i: [[array('q'), array('q'), 0] for _ in patterns] for i in field_indices}
+    # without quotes no value can contain the separator or a line break, so patterns containing those only match in
+    # quoted records.
+    unquoted_patterns = [j for j, pattern in enumerate(patterns) if sep not in pattern and newline not in pattern]
+
+    def count_record(record: bytes, has_quote: bool, candidates: list, row: int, offset: int) -> None:
+        fields = split_csv_record(record, dialect)
+        for i in field_indices:
+            if i >= len(fields):
+                break
+            value = fields[i]
+            if has_quote:
+                value = unquote_field(value, dialect)
+                if replace_linebreaks:
+                    value = value.replace(newline, b'').replace(cr, b'')
+            for j in candidates:
+                occurances = value.count(patterns[j])
+                if occurances:
+                    match = matches[i][j]
+                    match[0].append(row)
+                    match[1].append(offset)
+                    match[2] += occurances
+
+    for block_offset, block in iter_csv_blocks(buffer, start, end, dialect):
+        block_start_row = row_count
+        if quote not in block and not block_has_blank_lines(block, dialect):
+            # fast path: every line is a record, so we count the line ends and only split the lines containing a
+            # pattern, which we jump to with find.
+            block_rows = block.count(newline) + (0 if block.endswith(newline) else 1)
+            line_starts = set()
+            for j in unquoted_patterns:
+                pos = block.find(patterns[j])
+                while pos != -1:
+                    line_starts.add(block.rfind(newline, 0, pos) + 1)
+                    line_end = block.find(newline, pos)
+                    if line_end == -1:
+                        break
+                    pos = block.find(patterns[j], line_end + len(newline))
+            # the row of a line is the number of line ends in front of it, counted from the previous matching line
+            row, previous_start = row_count, 0
+            for line_start in sorted(line_starts):
+                row += block.count(newline, previous_start, line_start)
+                previous_start = line_start
+                line_end = block.find(newline, line_start)
+                record = block[line_start:line_end if line_end != -1 else len(block)]
+                count_record(record, False, [j for j in unquoted_patterns if patterns[j] in record], row,
+                             block_offset + line_start)
+            row_count += block_rows
+        else:
+            for offset, record in iter_block_records(block, block_offset, dialect):
+                if record in (b'', cr):
+                    continue # blank lines are skipped like in pandas
+                has_quote = quote in record
+                # most records contain none of the patterns, those are never split.
+                candidates = [j for j in (range(len(patterns)) if has_quote else unquoted_patterns)
+                              if patterns[j] in record]
+                if candidates:
+                    count_record(record, has_quote, candidates, row_count, offset)
+                row_count += 1
+        if progress is not None:
+            progress(len(block), row_count - block_start_row)
+    return row_count, matches
+
+
+def validate_byte_range(buffer, start: int, end: int, dialect: dict, expected_fields: int, first_line: int = 1,
+                        progress=None) -> dict:
+    """Checks the structure of all records between the byte offsets start and end without parsing them. Returns
+    {'records', 'lines', 'field_counts': Counter of the field counts, 'offsets', 'lines_of_records', 'fields', 'issues'},
+    the last four are arrays with one entry per flagged record (see RECORD_ISSUES), lines are counted from first_line.
+    progress is called like in count_chars_in_byte_range.
+
+    Every block is searched with numpy instead of record by record: a record starts on every line in front of which
+    the block has an even number of quotes, and a separator splits fields if an even number of quotes is in front of
+    it. Literal quotes (see find_literal_quotes) are not counted. This is the rule of iter_block_records and
+    split_csv_record, as blocks start at record boundaries."""
+    newline, quote, cr = dialect['newline'][0], dialect['quote'][0], dialect['cr'][0]
+    field_counts = Counter()
+    offsets, lines_of_records, fields, issues = array('q'), array('q'), array('q'), array('b')
+    record_count = 0
+    line = first_line
+    for block_offset, block in iter_csv_blocks(buffer, start, end, dialect):
+        data = np.frombuffer(block, dtype=np.uint8)
+        line_ends = np.flatnonzero(data == newline)
+        bounds = line_ends if block.endswith(dialect['newline']) else np.append(line_ends, len(block))
+        line_starts = np.concatenate(([0], line_ends + 1))[:len(bounds)]
+        quotes = np.flatnonzero(data == quote)
+        literal_quotes = find_literal_quotes(block, dialect)
+        if len(literal_quotes):
+            quotes = np.setdiff1d(quotes, literal_quotes, assume_unique=True)
+        line_quotes = np.diff(np.searchsorted(quotes, bounds), prepend=0)
+        # first and last line of every record
+        first_lines = np.flatnonzero((np.cumsum(line_quotes) - line_quotes) % 2 == 0)
+        last_lines = np.append(first_lines[1:], len(bounds)) - 1
+        record_starts, record_ends = line_starts[first_lines], bounds[last_lines]
+        separators = np.flatnonzero(data == dialect['sep'][0])
+        separators = separators[np.searchsorted(quotes, separators) % 2 == 0]
+        record_fields = np.searchsorted(separators, record_ends) - np.searchsorted(separators, record_starts) + 1
+        record_quotes = np.add.reduceat(line_quotes, first_lines)
+        # blank lines are skipped like in pandas
+        lengths = record_ends - record_starts
+        blank = (first_lines == last_lines) & ((lengths == 0) | (
+            (lengths == 1) & (data[np.minimum(record_starts, len(data) - 1)] == cr)))
+        record_issues = (np.where(record_fields != expected_fields, RECORD_RAGGED, 0)
+                         | np.where(record_quotes % 2 == 1, RECORD_UNBALANCED_QUOTES,
+                                    np.where(first_lines != last_lines, RECORD_EMBEDDED_NEWLINE, 0)))
+        if len(literal_quotes):
+            stray = np.unique(np.searchsorted(record_starts, literal_quotes, side='right') - 1)
+            record_issues[stray] |= RECORD_STRAY_QUOTE
+        values, counts = np.unique(record_fields[~blank], return_counts=True)
+        field_counts.update(dict(zip(values.tolist(), counts.tolist())))
+        flagged = np.flatnonzero((record_issues != 0) & ~blank)
+        offsets.extend((record_starts[flagged] + block_offset).tolist())
+        lines_of_records.extend((first_lines[flagged] + line).tolist())
+        fields.extend(record_fields[flagged].tolist())
+        issues.extend(record_issues[flagged].tolist())
+        block_records = len(first_lines) - int(blank.sum())
+        record_count += block_records
+        line += len(bounds)
+        if progress is not None:
+            progress(len(block), block_records)
+    return {
+        'records': record_count,
+        'lines': line - first_line,
+        'field_counts': field_counts,
+        'offsets': np.asarray(offsets, dtype=np.int64),
+        'lines_of_records': np.asarray(lines_of_records, dtype=np.int64),
+        'fields': np.asarray(fields, dtype=np.int64),
+        'issues': np.asarray(issues, dtype=np.int8),
+    }
+
+
+def get_issue_names(issues: int) -> str:
+    return ', '.join(name for flag, name in RECORD_ISSUES.items() if issues & flag)
+
+
+def read_record_at(buffer, offset: int, dialect: dict, max_length: int = None) -> bytes:
+    """Returns the record starting at the byte offset, without its line end. Records longer than max_length are
+    returned as None, an offset within a quoted value makes the rest of the file look like one open quote."""
+    newline = dialect['newline']
+    end = buffer.find(newline, offset)
+    open_quote = end != -1 and is_quote_open(buffer[offset:end], dialect)
+    # a quoted field is still open, the line break belongs to the value
+    while open_quote:
+        if max_length is not None and end - offset > max_length:
+            return None
+        line_start = end + len(newline)
+        end = buffer.find(newline, line_start)
+        if end == -1:
+            break
+        open_quote = is_quote_open(buffer[line_start:end], dialect, True)
+    return buffer[offset:end if end != -1 else len(buffer)]
+
+
+def read_next_record(buffer, position: int, start: int, end: int, dialect: dict) -> tuple:
+    """Returns (offset, record) of the first record which starts at or after the byte position, blank lines are
+    skipped. None if there is no record up to end."""
+    newline, cr = dialect['newline'], dialect['cr']
+    while True:
+        if position <= start:
+            offset = start
+        else:
+            # a line end right in front of position means the line starts at position
+            line_end = buffer.find(newline, position - len(newline), end)
+            if line_end == -1:
+                return None
+            offset = line_end + len(newline)
+        if offset >= end:
+            return None
+        record = read_record_at(buffer, offset, dialect, SAMPLE_MAX_RECORD_BYTES)
+        if record is not None and record not in (b'', cr):
+            return offset, record
+        position = offset + 1
+
+
+def get_sample_field_count(record: bytes, dialect: dict) -> int:
+    """Returns the field count of a sampled record, -1 if it is malformed. A start within a quoted value shows as a
+    field with a stray quote or as a line break outside of quotes."""
+    quote, newline = dialect['quote'], dialect['newline']
+    fields = split_csv_record(record, dialect)
+    for field in fields:
+        if quote in field and not (len(field) > 1 and field.startswith(quote) and field.endswith(quote)):
+            return -1
+        if newline in field and not field.startswith(quote):
+            return -1
+    return len(fields)
+
+
+def sample_csv_records(buffer, start: int, end: int, dialect: dict, sample_size: int, method: str,
+                       rng: np.random.Generator) -> list:
+    """Picks about sample_size records between the byte offsets start and end, without reading the bytes in between.
+    stratified cuts the range into sample_size strata of the same size and picks one random byte offset in each, random
+    picks all offsets uniformly. Every offset is moved to the start of the next line. A line within a quoted value is
+    no record start, it is malformed or mostly has another field count than the records, those are moved on to the next
+    line. Returns (offset, record) in file order, without duplicates."""
+    if end <= start or sample_size < 1:
+        return []
+    if method == 'stratified':
+        bounds = np.linspace(start, end, sample_size + 1)
+        positions = rng.uniform(bounds[:-1], bounds[1:])
+    else:
+        positions = np.sort(rng.uniform(start, end, sample_size))
+    candidates = [read_next_record(buffer, int(position), start, end, dialect) for position in positions]
+    candidates = [candidate for candidate in candidates if candidate is not None]
+    if not candidates:
+        return []
+    field_counts = [get_sample_field_count(record, dialect) for _, record in candidates]
+    # most sampled lines are record starts, their field count is the one of the file
+    expected_field_count = Counter(count for count in field_counts if count != -1).most_common(1)
+    if not expected_field_count:
+        return []
+    expected_field_count = expected_field_count[0][0]
+    sample = {}
+    for candidate, field_count in zip(candidates, field_counts):
+        attempts = 0
+        while field_count != expected_field_count and attempts < SAMPLE_ALIGN_ATTEMPTS:
+            candidate = read_next_record(buffer, candidate[0] + 1, start, end, dialect)
+            if candidate is None:
+                break
+            field_count = get_sample_field_count(candidate[1], dialect)
+            attempts += 1
+        if candidate is not None and field_count == expected_field_count:
+            sample[candidate[0]] = candidate[1]
+    return sorted(sample.items())
+
+
+def wilson_interval(successes: int, trials: int, confidence: float = DEFAULT_CONFIDENCE) -> tuple:
+    """Wilson score interval of a share, which unlike the normal approximation stays within 0 and 1 and is usable for
+    shares close to 0 - most columns hardly ever contain the check characters."""
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    share = successes / trials
+    denominator = 1 + z ** 2 / trials
+    centre = (share + z ** 2 / (2 * trials)) / denominator
+    margin = z * (share * (1 - share) / trials + z ** 2 / (4 * trials ** 2)) ** 0.5 / denominator
+    return max(centre - margin, 0.0), min(centre + margin, 1.0)
+
+
+def split_csv_into_ranges(buffer, start: int, end: int, dialect: dict, parts: int) -> list:
+    """Splits the bytes between start and end into up to parts ranges of about the same size, which start and end at
+    record boundaries. The quotes have to be counted from the start to know which line ends are within quoted fields,
+    so this walks the blocks of the byte scanner once; the ranges are made of whole blocks."""
+    range_size = (end - start) / max(parts, 1)
+    boundaries = [start]
+    for block_offset, block in iter_csv_blocks(buffer, start, end, dialect):
+        block_end = block_offset + len(block)
+        if block_end < end and block_end - boundaries[-1] >= range_size and len(boundaries) < parts:
+            boundaries.append(block_end)
+    boundaries.append(end)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def read_csv_range(path: Path, start: int, end: int, encoding: str, separator: str, field_indices: list,
+                   parsing_engine: str, replace_linebreaks: bool, string_storage: str = DEFAULT_STRING_STORAGE
+                   ) -> pd.DataFrame:
+    """Parses the records between the byte offsets start and end with pandas. The columns are named by their field
+    index, the header is read by the calling process. Runs in the worker processes of the parallel mode."""
+    with open(path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    if encoding == 'utf_8_sig':
+        encoding = 'utf_8' # the BOM is only at the start of the file
+    engine = 'python' if parsing_engine == 'python' else 'c'
+    options = {} if engine == 'python' else {'low_memory': False} # low_memory is not supported by python engine
+    dtype = get_string_dtype(string_storage)
+    try:
+        chunk = pd.read_csv(BytesIO(data), sep=separator, encoding=encoding, header=None, dtype=dtype, na_values='',
+                            usecols=field_indices, engine=engine, **options)
+    except pd.errors.EmptyDataError:
+        # the range only consists of blank lines
+        return pd.DataFrame(columns=field_indices, dtype=dtype)
+    return apply_substitutions(chunk, get_substitutions(replace_linebreaks))
+
+
+def analyze_csv_range(path: Path, start: int, end: int, encoding: str, separator: str, field_indices: list,
+                      check_chars: list, parsing_engine: str, replace_linebreaks: bool,
+                      string_storage: str = DEFAULT_STRING_STORAGE) -> tuple:
+    """Counts the check characters within the records between the byte offsets start and end, with the byte scanner
+    for the mmap engine or with pandas otherwise. Returns the result in the form of count_chars_in_byte_range. Runs in
+    the worker processes of the parallel mode."""
+    if parsing_engine == 'mmap' and can_scan_bytes(encoding, separator, check_chars):
+        with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return count_chars_in_byte_range(buffer, start, end, get_byte_dialect(encoding, separator), field_indices,
+                                             get_byte_patterns(encoding, check_chars), replace_linebreaks)
+    chunk = read_csv_range(path, start, end, encoding, separator, field_indices, parsing_engine, replace_linebreaks,
+                           string_storage)
+    matches = {}
+    for i in field_indices:
+        char_matches = count_chars_in_column(chunk[i], check_chars)
+        # pandas does not tell us where the records start, without offsets the preview needs the loaded dataframe
+        matches[i] = [[char_matches[char][0], None, char_matches[char][1]] for char in check_chars]
+    return len(chunk), matches
+
+
+def read_byte_sample(path: Path, sample_bytes: int = SNIFF_SAMPLE_BYTES) -> list:
+    """Reads the head, the middle and the tail of the file, about sample_bytes in total, as [(offset, bytes)]. Files up
+    to sample_bytes are read as a whole."""
+    size = path.stat().st_size
+    with open(path, 'rb') as file:
+        if size <= sample_bytes:
+            return [(0, file.read())]
+        part = sample_bytes // 3
+        segments = []
+        for offset in (0, (size - part) // 2, size - part):
+            offset -= offset % 4 # aligned to the code units of utf_16 and utf_32
+            file.seek(offset)
+            segments.append((offset, file.read(part)))
+    return segments
+
+
+def detect_wide_encoding(head: bytes) -> str:
+    """Recognizes utf_16 and utf_32 without BOM by their zero bytes: the characters of a csv are mostly ascii, which
+    has zero bytes in the upper places of the code units. None if the head does not look like it."""
+    n = len(head) - len(head) % 4
+    if n == 0 or head.count(0) < n // 4:
+        return None
+    zeros = [head[k:n:4].count(0) / (n // 4) for k in range(4)]
+    if min(zeros[1:]) > 0.9:
+        return 'utf_32_le'
+    if min(zeros[:3]) > 0.9:
+        return 'utf_32_be'
+    if zeros[1] > 0.5 and zeros[3] > 0.5:
+        return 'utf_16_le'
+    if zeros[0] > 0.5 and zeros[2] > 0.5:
+        return 'utf_16_be'
+    return None
+
+
+def decode_byte_sample(segments: list, file_size: int, codec: str) -> list:
+    """Decodes the segments of read_byte_sample, raises UnicodeDecodeError if the codec does not fit. Segments after
+    the head start behind their first line break and segments before the end of the file end with their last one, so no
+    character and no line is cut."""
+    unit = 4 if codec.startswith('utf_32') else 2 if codec.startswith('utf_16') else 1
+    texts = []
+    for offset, data in segments:
+        is_head = offset == 0
+        is_tail = offset + len(data) >= file_size
+        if unit == 1:
+            # the line break is a single \n byte in all candidates of SNIFF_ENCODINGS
+            if not is_head:
+                data = data[data.find(b'\n') + 1:]
+            if not is_tail:
+                data = data[:data.rfind(b'\n') + 1]
+            text = data.decode(codec)
+        else:
+            # surrogate pairs can be cut at the start of a segment, the start is thrown away with the first line anyway
+            decoder = codecs.getincrementaldecoder(codec)(errors='strict' if is_head else 'replace')
+            text = decoder.decode(data, final=is_tail)
+            if not is_head:
+                text = text[text.find('\n') + 1:]
+            if not is_tail:
+                text = text[:text.rfind('\n') + 1]
+        texts.append(text.lstrip('\ufeff') if is_head else text)
+    return texts
+
+
+def score_decoded_text(text: str) -> float:
+    """Rates how plausible the decoded text is, 1.0 for pure ascii. Counts the share of the non ascii characters which
+    are no control characters, private use or unassigned. Typical of a wrong single byte encoding and rare in real text
+    are runs of four or more non ascii latin letters ("Ïðèâåò" for cyrillic read as cp1252), words which mix ascii
+    letters with letters of another script ("GrцЯe" for german read as cp1251), symbols within words and box drawing
+    next to letters ("K÷ln", "─rger" for german read as cp850) and C1 control characters, they count against it."""
+    non_ascii = [char for char in text if ord(char) > 127]
+    if not non_ascii:
+        return 1.0
+    plausible = sum(unicodedata.category(char)[0] != 'C' for char in non_ascii)
+    suspicious = sum(unicodedata.name(char, '').startswith('LATIN')
+                     for run in findall(r'[^\x00-\x7f]{4,}', text) for char in run)
+    suspicious += sum(unicodedata.category(char)[0] == 'L' and not unicodedata.name(char, '').startswith('LATIN')
+                      for pair in findall(r'[A-Za-z][^\x00-\x7f]|[^\x00-\x7f](?=[A-Za-z])', text)
+                      for char in pair if ord(char) > 127)
+    # symbols like °, ² or € stand next to words or numbers, but hardly ever between two letters
+    suspicious += sum(len(run) for run in findall(r'(?<=[^\W\d_])[^\w\s\x00-\x7f]+(?=[^\W\d_])', text))
+    suspicious += len(findall(r'[^\W\d_][\u2500-\u259f]|[\u2500-\u259f](?=[^\W\d_])', text))
+    suspicious += len(findall(r'[\x80-\x9f]', text))
+    return (plausible - suspicious) / len(non_ascii)
+
+
+def sniff_separator(texts: list) -> list:
+    """Ranks SNIFF_SEPARATORS by how consistent the field counts of the records in the texts are. Returns
+    [(separator, share of records with the most common field count, that field count)], best first. Separators which do
+    not split the records are left out."""
+    ranking = []
+    for preference, separator in enumerate(SNIFF_SEPARATORS):
+        field_counts = Counter(len(row) for text in texts for row in csv.reader(StringIO(text), delimiter=separator)
+                               if row)
+        if not field_counts:
+            continue
+        field_count, records = field_counts.most_common(1)[0]
+        if field_count < 2:
+            continue
+        consistency = records / sum(field_counts.values())
+        # the true separator mostly splits into more fields than a character which is part of some values
+        ranking.append((round(consistency, 2), field_count, -preference, separator))
+    ranking.sort(reverse=True)
+    return [(separator, consistency, field_count) for consistency, field_count, _, separator in ranking]
+
+
+def is_number(value: str) -> bool:
+    try:
+        float(value.replace(',', '.'))
+    except ValueError:
+        return False
+    return True
+
+
+def sniff_header(text: str, separator: str) -> bool:
+    """Guesses if the first record of the text is a header. Every column votes: a name which is one of the values of
+    its column votes against a header, a name which does not fit the values (text above numbers, another length than
+    values of one length, no digits above values which all have digits) votes for it. A name of the same length as its
+    values does not vote, short names like a, b, c are common. Duplicate names are no header, undecided files are
+    taken as having a header."""
+    rows = [row for row in csv.reader(StringIO(text), delimiter=separator) if row]
+    if len(rows) < 2:
+        return True
+    header, data = rows[0], rows[1:]
+    names = [name for name in header if name.strip()]
+    if len(set(names)) < len(names):
+        return False
+    votes = 0
+    for k, name in enumerate(header):
+        values = [row[k] for row in data if len(row) == len(header) and row[k] != '']
+        if not name.strip() or not values:
+            continue # pandas exports have an unnamed index column
+        if name in values:
+            votes -= 1
+        elif sum(map(is_number, values)) > 0.9 * len(values):
+            votes += -1 if is_number(name) else 1
+        elif len(set(values)) == 1:
+            votes += 1 # a constant column and the name is not the constant
+        elif len(set(map(len, values))) == 1:
+            votes += 0 if len(name) == len(values[0]) else 1
+        elif all(any(char.isdigit() for char in value) for value in values):
+            votes += -1 if any(char.isdigit() for char in name) else 1
+    return votes >= 0
+
+
+def sniff_csv_format(path: Path, sample_bytes: int = SNIFF_SAMPLE_BYTES) -> dict:
+    """Detects the encoding, the separator and the header of a csv file from a byte sample of its head, middle and
+    tail. The encodings which decode the sample are ranked by score_decoded_text, the separators by sniff_separator.
+    Returns {'encoding', 'separator', 'header', 'field_count', 'encodings': [(encoding, score)], 'separators':
+    [(separator, consistency, field_count)]}."""
+    file_size = path.stat().st_size
+    segments = read_byte_sample(path, sample_bytes)
+    head = segments[0][1]
+    candidates = [(encoding, codec) for bom, encoding, codec in SNIFF_BOMS if head.startswith(bom)][:1]
+    if not candidates:
+        wide_encoding = detect_wide_encoding(head)
+        candidates = [(wide_encoding, wide_encoding)] if wide_encoding else [(e, e) for e in SNIFF_ENCODINGS]
+    encodings = []
+    for encoding, codec in candidates:
+        try:
+            texts = decode_byte_sample(segments, file_size, codec)
+        except UnicodeDecodeError:
+            continue
+        encodings.append((score_decoded_text(''.join(texts)), -len(encodings), encoding, texts))
+        if codec == 'utf_8':
+            # non ascii text in another encoding is hardly ever valid utf_8 by chance, the single byte encodings would
+            # decode it into plausible looking characters as well
+            break
+    if not encodings:
+        raise ValueError("None of the known encodings can decode the file.")
+    # sorted by score, equally plausible encodings in the order of SNIFF_ENCODINGS
+    encodings.sort(reverse=True, key=lambda candidate: candidate[:2])
+    texts = encodings[0][3]
+    separators = sniff_separator(texts)
+    separator, _, field_count = separators[0] if separators else (DEFAULT_CHAR_TO_CHECK, 1.0, 1)
+    return {
+        'encoding': encodings[0][2],
+        'separator': separator,
+        'header': sniff_header(texts[0], separator),
+        'field_count': field_count,
+        'encodings': [(encoding, round(score, 4)) for score, _, encoding, _ in encodings],
+        'separators': separators,
+    }
+
+
+class ResultCache:
+    """On disk cache of parsed dataframes (as feather) and analysis results per character (as npz and json). Every
+    entry is a directory named after the fingerprint of the file and the settings it was read with. The modification
+    time of the entry is its last use, which is what we evict on once the cache grows over max_bytes.
+
+    The cache is best effort: errors while writing or evicting are logged and never fail the load or the analysis,
+    an entry which can't be read (or was evicted by another process in the meantime) is a miss."""
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def get_key(file_handler) -> str:
+        """Fingerprint of the file (path, size, mtime) and of all settings which change the parsed data."""
+        stat = file_handler.path.stat()
+        fingerprint = [str(file_handler.path.resolve()), stat.st_size, stat.st_mtime_ns, file_handler.encoding,
+                       file_handler.seperator, file_handler.file_header, file_handler.parsing_engine,
+                       file_handler.supress_unnamed_columns, file_handler.replace_linebreaks,
+                       file_handler.string_storage]
+        return sha1(json.dumps(fingerprint).encode('utf_8')).hexdigest()
+
+    def touch(self, entry: Path) -> None:
+        """Marks the entry as used just now."""
+        os.utime(entry)
+
+    def load_dataframe(self, key: str):
+        """Returns the cached dataframe, None if there is none."""
+        entry = self.cache_dir / key
+        try:
+            dataframe = pd.read_feather(entry / 'data.feather')
+            with open(entry / 'columns.json', 'r', encoding='utf_8') as file:
+                # feather only allows string column names, without a header pandas names the columns with ints
+                dataframe.columns = json.load(file)
+            self.touch(entry)
+        except (OSError, ValueError, pyarrow.ArrowException):
+            return None
+        return dataframe
+
+    def store_dataframe(self, key: str, dataframe: pd.DataFrame) -> None:
+        entry = self.cache_dir / key
+        try:
+            entry.mkdir(parents=True, exist_ok=True)
+            with open(entry / 'columns.json', 'w', encoding='utf_8') as file:
+                json.dump(list(dataframe.columns), file)
+            dataframe.set_axis([str(col) for col in dataframe.columns], axis=1).to_feather(entry / 'data.feather')
+            self.touch(entry)
+        except OSError as e:
+            log.warning("Could not cache the dataframe in %s: %s", entry, e)
+            return
+        self.evict(keep=key)
+
+    @staticmethod
+    def get_char_file_name(char: str) -> str:
+        return f"char_{sha1(char.encode('utf_8')).hexdigest()}"
+
+    def load_char_matches(self, key: str, char: str):
+        """Returns the row count of the file and the {column: (positions, occurances, offsets)} of an earlier analysis
+        for the character, None if there is none."""
+        entry = self.cache_dir / key
+        file_name = self.get_char_file_name(char)
+        try:
+            with open(entry / f"{file_name}.json", 'r', encoding='utf_8') as file:
+                meta = json.load(file)
+            with np.load(entry / f"{file_name}.npz") as arrays:
+                # columns are stored as a list, json objects would turn int column names into strings
+                matches = {col: (arrays[f"positions_{k}"], occurances,
+                                 arrays[f"offsets_{k}"] if has_offsets else None)
+                           for k, (col, occurances, has_offsets) in enumerate(meta['columns'])}
+            self.touch(entry)
+        except (OSError, ValueError, KeyError, EOFError, BadZipFile):
+            return None
+        return meta['dataframe_length'], matches
+
+    def store_char_matches(self, key: str, char: str, dataframe_length: int, matches: dict) -> None:
+        entry = self.cache_dir / key
+        file_name = self.get_char_file_name(char)
+        arrays = {}
+        columns = []
+        for k, (col, (positions, occurances, offsets)) in enumerate(matches.items()):
+            arrays[f"positions_{k}"] = positions
+            if offsets is not None:
+                arrays[f"offsets_{k}"] = offsets
+            columns.append([col, occurances, offsets is not None])
+        try:
+            entry.mkdir(parents=True, exist_ok=True)
+            np.savez(entry / f"{file_name}.npz", **arrays)
+            with open(entry / f"{file_name}.json", 'w', encoding='utf_8') as file:
+                json.dump({'char': char, 'dataframe_length': dataframe_length, 'columns': columns}, file)
+            self.touch(entry)
+        except OSError as e:
+            log.warning("Could not cache the analysis in %s: %s", entry, e)
+            return
+        self.evict(keep=key)
+
+    def evict(self, keep: str) -> None:
+        """Removes the least recently used entries until the cache is below max_bytes. The entry keep is never
+        removed. Files within the cache dir are no entries and left alone, other processes (the workers of the cli)
+        may remove entries while we look at them."""
+        entries = []
+        total_size = 0
+        try:
+            cache_entries = list(self.cache_dir.iterdir())
+        except OSError as e:
+            log.warning("Could not evict from the cache in %s: %s", self.cache_dir, e)
+            return
+        for entry in cache_entries:
+            try:
+                if not entry.is_dir():
+                    continue
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                entries.append((entry.stat().st_mtime, size, entry))
+            except OSError:
+                continue # removed in the meantime
+            total_size += size
+        for _, size, entry in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            if entry.name != keep:
+                shutil.rmtree(entry, ignore_errors=True)
+                total_size -= size
+
+    def clear(self) -> None:
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+class ExportWriter:
+    """Writes the chunks of an export to the binary target in one of the export_formats. prepare turns a chunk into the
+    bytes or the arrow table to write and only reads its arguments, so many chunks are prepared in parallel. write
+    appends the prepared chunks to the target and has to be called in file order, one at a time. Decompressors read
+    the gzip members and zstd frames of the chunks as one stream."""
+
+    def __init__(self, target, export_format: str, encoding: str, separator: str, columns, header):
+        self.target = target
+        self.export_format = export_format
+        self.encoding = encoding
+        self.separator = separator
+        self.header = header
+        # every chunk is encoded on its own, the BOM of utf_8_sig, utf_16 and utf_32 is only kept for the first one
+        self.bom = ''.encode(encoding)
+        # zlib and zstd release the gil, so the chunks are really compressed in parallel. the gzip codec of pyarrow
+        # fails on small chunks, gzip members are written by the standard library
+        if export_format == 'csv.gz':
+            self.compress = partial(gzip.compress, compresslevel=6)
+        elif export_format == 'csv.zst':
+            self.compress = partial(pyarrow.Codec(EXPORT_COMPRESSION[export_format]).compress, asbytes=True)
+        else:
+            self.compress = None
+        # parquet and feather need column names, files without header get the names pandas numbered them with
+        self.schema = pyarrow.schema([(str(col), pyarrow.string()) for col in columns])
+        if export_format == 'parquet':
+            self.writer = pq.ParquetWriter(target, self.schema, compression=EXPORT_COMPRESSION[export_format])
+        elif export_format == 'feather':
+            # feather version 2 is the arrow ipc file format
+            options = pyarrow.ipc.IpcWriteOptions(compression=EXPORT_COMPRESSION[export_format])
+            self.writer = pyarrow.ipc.new_file(target, self.schema, options=options)
+        elif export_format in ('csv', 'csv.gz', 'csv.zst'):
+            self.writer = None
+        else:
+            raise ValueError(f"Unsupported export format: {export_format}")
+
+    def prepare(self, chunk: pd.DataFrame, is_first_chunk: bool):
+        if self.writer is not None:
+            chunk = chunk.set_axis(self.schema.names, axis=1)
+            return pyarrow.Table.from_pandas(chunk, schema=self.schema, preserve_index=False)
+        # header is only written once, at the top of the file
+        text = chunk.to_csv(None, sep=self.separator, header=self.header if is_first_chunk else False, index=False,
+                            quotechar='"')
+        data = text.encode(self.encoding)
+        if not is_first_chunk and self.bom and data.startswith(self.bom):
+            data = data[len(self.bom):]
+        return data if self.compress is None else self.compress(data)
+
+    def write(self, prepared) -> None:
+        if self.writer is not None:
+            self.writer.write_table(prepared)
+        else:
+            self.target.write(prepared)
+
+    def close(self) -> None:
+        """Writes the footer of parquet and feather, the target is closed by the caller."""
+        if self.writer is not None:
+            self.writer.close()
+
+
+def get_resident_memory() -> int:
+    """Returns the resident memory of the process in bytes, arrow buffers included."""
+    return psutil.Process().memory_info().rss
+
+
+class StageMetrics:
+    """Metrics of one stage (load, analyze or export) of the FileHandler: bytes read, rows, chunks, columns, the time
+    per column and the elapsed time. The stages update it while they run, from the executor threads as well, and the
+    ui polls as_dict for the progress bar. Every update is passed to the callbacks, the finished stage is appended to
+    log_path as a json line. Used as a context manager, errors of the stage end up in the metrics.
+
+    The peak memory is the highest resident memory of the process while the stage runs, sampled every
+    MEMORY_SAMPLE_INTERVAL seconds by a thread of its own, so it is not the peak of an earlier stage. Freed memory is
+    not always given back to the system, the growth over the memory at the start tells what the stage itself took."""
+
+    def __init__(self, stage: str, path: Path, total_bytes: int = 0, total_columns: int = 0, callbacks: list = (),
+                 log_path: Path = None):
+        self.stage = stage
+        self.method = None # how the stage was done: cache, dataframe, chunks, bytes or parallel
+        self.path = path
+        self.total_bytes = total_bytes
+        self.total_columns = total_columns
+        self.bytes_read = 0
+        self.rows = 0
+        self.chunks = 0
+        self.column_seconds = {}
+        self.started = perf_counter()
+        self.elapsed = 0.0
+        self.done = False
+        self.error = None
+        self.callbacks = list(callbacks)
+        self.log_path = log_path
+        self.start_memory = get_resident_memory()
+        self.peak_memory = self.start_memory
+        self.sampling_done = threading.Event()
+
+    def __enter__(self):
+        threading.Thread(target=self.sample_memory, daemon=True).start()
+        self.notify()
+        return self
+
+    def sample_memory(self) -> None:
+        while not self.sampling_done.wait(MEMORY_SAMPLE_INTERVAL):
+            self.update_peak_memory()
+
+    def update_peak_memory(self) -> None:
+        self.peak_memory = max(self.peak_memory, get_resident_memory())
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.finish(None if exc_value is None else f"{exc_type.__name__}: {exc_value}")
+        return False # errors are raised on
+
+    def advance(self, bytes_read: int = 0, rows: int = 0, chunks: int = 0) -> None:
+        self.bytes_read += bytes_read
+        self.rows += rows
+        self.chunks += chunks
+        self.notify()
+
+    def column_done(self, column, seconds: float) -> None:
+        self.column_seconds[column] = seconds
+        self.notify()
+
+    def get_fraction(self):
+        """Share of the stage which is done, None if there is nothing to measure it by."""
+        if self.done:
+            return 1.0
+        if self.total_bytes:
+            return min(self.bytes_read / self.total_bytes, 1.0)
+        if self.total_columns:
+            return len(self.column_seconds) / self.total_columns
+        return None
+
+    def as_dict(self) -> dict:
+        elapsed = self.elapsed if self.done else perf_counter() - self.started
+        return {
+            'stage': self.stage,
+            'method': self.method,
+            'file': None if self.path is None else str(self.path),
+            'bytes_read': self.bytes_read,
+            'total_bytes': self.total_bytes,
+            'rows': self.rows,
+            'chunks': self.chunks,
+            'fraction': self.get_fraction(),
+            'elapsed_seconds': round(elapsed, 4),
+            'rows_per_second': round(self.rows / elapsed) if elapsed else None,
+            'peak_memory_bytes': self.peak_memory,
+            'memory_growth_bytes': self.peak_memory - self.start_memory,
+            # json objects would turn int column names into strings
+            'column_seconds': [[col, round(seconds, 4)] for col, seconds in self.column_seconds.items()],
+            'done': self.done,
+            'error': self.error,
+        }
+
+    def notify(self) -> None:
+        if self.callbacks:
+            metrics = self.as_dict()
+            for callback in self.callbacks:
+                callback(metrics)
+
+    def finish(self, error: str = None) -> None:
+        self.elapsed = perf_counter() - self.started
+        self.sampling_done.set()
+        self.update_peak_memory()
+        self.done = True
+        self.error = error
+        self.notify()
+        if self.log_path is not None:
+            with open(self.log_path, 'a', encoding='utf_8') as file:
+                file.write(json.dumps({'time': datetime.now().isoformat(), **self.as_dict()}, default=str) + '\n')
+
+
+class OperationCancelled(Exception):
+    """Raised within an operation of the FileHandler once it was cancelled, see WorkerPool."""
+
+
+class WorkerPool:
+    """Long lived threads for the blocking work (parsing, counting, writing) of the FileHandler, shared by load, analyze
+    and export instead of a new executor per call. The operations are queued and run one at a time in the order they
+    were started, they all work on the same dataframe. Cancelling is cooperative: cancel() starts a new generation, the
+    running operation stops at its next check (between chunks, columns or blocks of the byte scanner) and the queued
+    ones before they start."""
+
+    def __init__(self, max_workers: int = None):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='character_check')
+        self.process_pool = None # processes of the parallel mode, started on first use, see get_process_pool
+        self.process_count = 0
+        self.generation = 0
+        self.running_generation = None # generation the running operation was started in, None if there is none
+        self.queued = 0 # operations waiting for the running one
+        self.lock = None
+        self.lock_loop = None
+
+    def get_lock(self) -> Lock:
+        # an asyncio lock is bound to one event loop, the cli and the benchmark run every file on a new one
+        loop = get_running_loop()
+        if self.lock_loop is not loop:
+            self.lock, self.lock_loop = Lock(), loop
+        return self.lock
+
+    @asynccontextmanager
+    async def operation(self):
+        """Waits for the operations started before and runs the body as the running operation."""
+        generation = self.generation
+        lock = self.get_lock()
+        self.queued += 1
+        try:
+            await lock.acquire()
+        finally:
+            self.queued -= 1
+        try:
+            self.running_generation = generation
+            self.check()
+            yield
+        finally:
+            self.running_generation = None
+            lock.release()
+
+    def run(self, function, *args):
+        """Runs function(*args) in the pool, returns the future to await."""
+        return get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def get_process_pool(self, process_count: int) -> concurrent.futures.ProcessPoolExecutor:
+        """Returns the process pool of the parallel mode. It lives on between the operations, so the processes are only
+        started once, unless the worker count changes or a process died."""
+        if self.process_pool is None or self.process_count != process_count:
+            self.drop_process_pool()
+            self.process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=process_count)
+            self.process_count = process_count
+        return self.process_pool
+
+    def run_in_process(self, process_count: int, function, *args):
+        """Runs function(*args) in the process pool, returns the future to await. function and args are pickled."""
+        return get_running_loop().run_in_executor(self.get_process_pool(process_count), function, *args)
+
+    def drop_process_pool(self) -> None:
+        """Shuts the process pool down without waiting, ranges which are parsed right now are finished in the
+        background."""
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+            self.process_pool = None
+
+    def check(self) -> None:
+        """Raises OperationCancelled if the running operation was cancelled. Thread safe, the byte scanner calls it from
+        the pool."""
+        if self.running_generation is not None and self.running_generation != self.generation:
+            raise OperationCancelled("The operation was cancelled.")
+
+    def cancel(self) -> bool:
+        """Cancels the running and all queued operations. False if nothing was running."""
+        if self.running_generation is None:
+            return False
+        self.generation += 1
+        return True
+
+
+def queued_operation(method):
+    """Runs a method of the FileHandler as an operation of its worker pool, see WorkerPool.operation."""
+    @wraps(method)
+    async def run_operation(self, *args, **kwargs):
+        async with self.worker_pool.operation():
+            return await method(self, *args, **kwargs)
+    return run_operation
+
+
 class FileHandler:
     """Singleton which handles the loading of the csv, the string replacement and the export"""
     _instance = None
@@ -68,17 +1408,43 @@ class FileHandler:
         self.check_chars = [DEFAULT_CHAR_TO_CHECK]
         self.check_chars_regex = DEFAULT_CHAR_TO_CHECK
         self.cols_with_char = {}
+        self.char_counts = {} # column -> {character: (matching rows, occurances)}
+        self.match_index = {} # column -> row positions of the matching rows
+        self.match_offsets = {} # column -> byte offsets of the matching records, only from the byte scanner
+        self.field_indices = {} # column -> field index within the records, to parse records at match_offsets
+        self.char_matches = {} # character -> {column: (positions, occurances, offsets)}, see get_chars_to_scan
+        self.char_matches_key = None # cache key of the file and settings the char_matches were counted for
         self.dataframe_length = 0
         self.file_header = DEFAULT_FILE_HEADER_NR # zero based row index!
         self.transformed_df = pd.DataFrame([])
         self.supress_unnamed_columns = True
         self.parsing_engine = 'c'
         self.replace_linebreaks = True
-        self.chunk_size = 50000
+        self.string_storage = DEFAULT_STRING_STORAGE
+        self.chunk_size = DEFAULT_CHUNK_SIZE
+        self.streaming_mode = False # analyze the file while reading it, without keeping the dataframe in memory
+        self.parallel_mode = False # parse or analyze byte ranges of the file in a process pool
+        self.worker_count = os.cpu_count() or 1
+        self.use_cache = False # keep parsed files and results in CACHE_DIR, opt-in as it writes to the home dir
+        self.cache = ResultCache()
+        self.metrics = None # StageMetrics of the running or the last stage, polled by the ui
+        self.metrics_callbacks = [] # called with the metrics of the stages on every update
+        self.metrics_log_path = None # finished stages are appended to this file, see StageMetrics
+        self.sample_size = DEFAULT_SAMPLE_SIZE
+        self.sample_method = sample_methods[0]
+        self.sample_estimates = {} # column -> estimated share of matching rows of the quick scan, see quick_scan
+        self.estimated_rows = 0 # row count of the file estimated by the quick scan
+        self.auto_detect_format = True # sniff encoding, separator and header when a file is chosen
+        self.detected_format = {} # result of sniff_csv_format for the file, see detect_file_format
+        self.export_format = DEFAULT_EXPORT_FORMAT
+        self.validation = {} # summary of the structural validation, see validate_file
+        self.flagged_records = {} # offsets, lines, field counts and issues of the records the validation flagged
 
     def __new__(cls, file_path, encoding):
         if cls._instance is None:
             cls._instance = super(FileHandler, cls).__new__(cls)
+            # not part of __init__, the pool and its queue live on when the handler is reset
+            cls._instance.worker_pool = WorkerPool()
         return cls._instance
 
     def toggle_header_mode(self, event) -> None:
@@ -101,48 +1467,170 @@ class FileHandler:
     def drop_df_and_reset_handler(self):
         self.__init__('','')
 
-    async def read_csv_in_chunks_c(self, file):
-        if self.supress_unnamed_columns:
+    @queued_operation
+    async def drop_file(self) -> None:
+        """Resets the handler once the operations started before are done, or stopped if they were cancelled. They use
+        the dataframe and the metrics of the handler up to their end."""
+        self.drop_df_and_reset_handler()
+
+    def start_stage(self, stage: str, total_bytes: int = 0, total_columns: int = 0) -> StageMetrics:
+        """Starts the metrics of a stage. The file size is the total of stages which read the file."""
+        self.metrics = StageMetrics(stage, self.path, total_bytes, total_columns, self.metrics_callbacks,
+                                    self.metrics_log_path)
+        return self.metrics
+
+    def get_file_size(self) -> int:
+        return self.path.stat().st_size
+
+    async def read_csv_in_chunks_c(self, file, usecols: list = None):
+        if self.supress_unnamed_columns and usecols is None:
             # usecols=lambda c: not c.startswith('Unnamed:') we use this to surpress unnamed cols in broken csvs
             chunks_iter = pd.read_csv(file, sep=self.seperator, encoding=self.encoding, low_memory=False, header=self.file_header,
-                                      dtype=str, na_values='',
-                                      usecols=lambda c: not c.startswith('Unnamed:'), engine='c', chunksize=self.chunk_size
+                                      dtype=get_string_dtype(self.string_storage), na_values='',
+                                      usecols=lambda c: not str(c).startswith('Unnamed:'), engine='c', chunksize=self.chunk_size
                                       )
         else:
             chunks_iter = pd.read_csv(file, sep=self.seperator, encoding=self.encoding, low_memory=False, header=self.file_header
-                                      , dtype=str, na_values='', engine='c', chunksize=self.chunk_size)
+                                      , dtype=get_string_dtype(self.string_storage), na_values='', usecols=usecols,
+                                      engine='c', chunksize=self.chunk_size)
         return chunks_iter
 
-    async def read_csv_in_chunks_python(self, file):
-        if self.supress_unnamed_columns:
+    async def read_csv_in_chunks_python(self, file, usecols: list = None):
+        if self.supress_unnamed_columns and usecols is None:
             # usecols=lambda c: not c.startswith('Unnamed:') we use this to surpress unnamed cols in broken csvs
             chunks_iter = pd.read_csv(file, sep=self.seperator, encoding=self.encoding, header=self.file_header,
-                                      dtype=str, na_values='',
-                                      usecols=lambda c: not c.startswith('Unnamed:'), engine='python',
+                                      dtype=get_string_dtype(self.string_storage), na_values='',
+                                      usecols=lambda c: not str(c).startswith('Unnamed:'), engine='python',
                                       chunksize=self.chunk_size
                                       )
         else:
-            chunks_iter = pd.read_csv(file, sep=self.seperator, encoding=self.encoding, low_memory=False, header=self.file_header
-                                      , dtype=str, na_values='', engine='python', chunksize=self.chunk_size)
+            chunks_iter = pd.read_csv(file, sep=self.seperator, encoding=self.encoding, header=self.file_header
+                                      , dtype=get_string_dtype(self.string_storage), na_values='', usecols=usecols,
+                                      engine='python', chunksize=self.chunk_size)
         return chunks_iter
 
+    async def get_chunks_iter(self, file, usecols: list = None):
+        """Returns the chunk iterator of pd.read_csv for the parsing engine chosen by the user. usecols limits the
+        columns to read."""
+        if self.parsing_engine == 'python': # in conditional because low_memory is not supported by python engine
+            return await self.read_csv_in_chunks_python(file, usecols)
+        elif self.parsing_engine in ('c', 'mmap'): # the mmap engine only counts, dataframes are parsed by the c engine
+            return await self.read_csv_in_chunks_c(file, usecols)
+        else:
+            raise ValueError(f"Unsupported engine: {self.parsing_engine}")
+
+    @queued_operation
     async def set_dataframe_from_filepath(self) -> None:
-        """Grabs dataframe from csv file and sets total length of the df within the fileHandler class."""
+        """Grabs dataframe from csv file and sets total length of the df within the fileHandler class. The parsed
+        dataframe is taken from the cache, if the file was read with the same settings before."""
+        with self.start_stage('load', total_bytes=self.get_file_size()) as metrics:
+            if self.use_cache:
+                cache_key = self.cache.get_key(self)
+                dataframe = await self.worker_pool.run(self.cache.load_dataframe, cache_key)
+                if dataframe is not None:
+                    self.dataframe = dataframe
+                    self.dataframe_length = len(self.dataframe)
+                    metrics.method = 'cache'
+                    metrics.advance(rows=self.dataframe_length)
+                    return
+            await self.read_dataframe_from_filepath()
+            if self.use_cache:
+                await self.worker_pool.run(self.cache.store_dataframe, cache_key, self.dataframe)
+
+    async def read_dataframe_from_filepath(self) -> None:
+        """Parses the csv file into the dataframe, in parallel if the parallel mode is active."""
+        if self.parallel_mode and can_split_bytes(self.encoding, self.seperator):
+            self.metrics.method = 'parallel'
+            await self.set_dataframe_from_filepath_parallel()
+            return
+        self.metrics.method = 'chunks'
         # for some reason this does not work for .pyw files any longer..
         with open(self.path, 'r', encoding=self.encoding) as file: # maybe try to play around with the newline option here
-            if self.parsing_engine == 'python': # in conditional because low_memory is not supported by python engine
-                chunks_iter = await self.read_csv_in_chunks_python(file)
-            elif self.parsing_engine == 'c':
-                chunks_iter = await self.read_csv_in_chunks_c(file)
-            else:
-                raise ValueError(f"Unsupported engine: {self.parsing_engine}")
+            chunks_iter = await self.get_chunks_iter(file)
             chunks = []
-            for chunk in chunks_iter:
+            # the chunks are read in the worker pool, so the ui stays responsive and can show the progress
+            while True:
+                # line breaks are deleted chunk by chunk, while the chunk is at hand anyway
+                chunk = await self.worker_pool.run(self.read_clean_chunk, chunks_iter)
+                if chunk is None:
+                    break
                 chunks.append(chunk)
-        self.dataframe = pd.concat(chunks, ignore_index=True)
-        if self.replace_linebreaks:
-            self.dataframe.replace({r'\n': '', r'\r': ''}, regex=True, inplace=True)
+                self.advance_chunk_metrics(file, len(chunk))
+        # concatenating copies all chunks, that takes a while on big files
+        self.dataframe = await self.worker_pool.run(partial(pd.concat, chunks, ignore_index=True))
+        self.dataframe_length = len(self.dataframe)
+
+    def read_clean_chunk(self, chunks_iter, char_out: str = None, char_in: str = None):
+        """Reads the next chunk and applies the line break substitutions and the swap of char_out for char_in to it in
+        one pass. None once the file is read."""
+        chunk = next(chunks_iter, None)
+        if chunk is None:
+            return None
+        return apply_substitutions(chunk, get_substitutions(self.replace_linebreaks, char_out, char_in))
+
+    def advance_chunk_metrics(self, file, rows: int) -> None:
+        """Adds a chunk read from file to the metrics. The position of the binary buffer below the text file are the
+        bytes pandas has read so far. Stops the operation here if it was cancelled."""
+        self.metrics.advance(bytes_read=file.buffer.tell() - self.metrics.bytes_read, rows=rows, chunks=1)
+        self.worker_pool.check()
+
+    def advance_block_metrics(self, bytes_read: int, rows: int) -> None:
+        """Progress of count_chars_in_byte_range, called from the pool. Raising here stops the scan."""
+        self.metrics.advance(bytes_read=bytes_read, rows=rows, chunks=1)
+        self.worker_pool.check()
+
+    def read_header_and_ranges(self, buffer) -> tuple:
+        """Reads the column names of the file and splits the data records into one byte range per worker."""
+        dialect = get_byte_dialect(self.encoding, self.seperator)
+        columns, field_indices, data_start = read_csv_header_bytes(
+            buffer, self.encoding, dialect, self.file_header, self.supress_unnamed_columns
+        )
+        byte_ranges = split_csv_into_ranges(buffer, data_start, len(buffer), dialect, int(self.worker_count))
+        return columns, field_indices, byte_ranges
+
+    async def run_on_ranges(self, function, *args) -> tuple:
+        """Runs function(path, start, end, encoding, separator, *args) on every byte range of the file in the process
+        pool of the worker pool. Returns the column names, their field indices and the results in the order of the
+        ranges."""
+        with open(self.path, 'rb') as file:
+            if file.seek(0, 2) == 0:
+                raise ValueError("No columns to parse from file")
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                columns, field_indices, byte_ranges = await self.worker_pool.run(self.read_header_and_ranges, buffer)
+        futures = []
+        for start, end in byte_ranges:
+            future = self.worker_pool.run_in_process(int(self.worker_count), function, self.path, start, end,
+                                                     self.encoding, self.seperator, field_indices, *args)
+            # the progress of the workers is only known once a range is done
+            future.add_done_callback(lambda _, size=end - start: self.metrics.advance(bytes_read=size, chunks=1))
+            futures.append(future)
+        pending = futures
+        try:
+            while pending:
+                _, pending = await wait(pending, timeout=0.5)
+                self.worker_pool.check()
+            return columns, field_indices, [future.result() for future in futures]
+        except OperationCancelled:
+            # the processes can't be interrupted, the ranges they work on are finished in the background while the
+            # waiting ones are dropped
+            for future in pending:
+                future.cancel()
+            raise
+        except concurrent.futures.BrokenExecutor:
+            # a process died (e.g. out of memory), the pool can't be used any more
+            self.worker_pool.drop_process_pool()
+            raise
+
+    async def set_dataframe_from_filepath_parallel(self) -> None:
+        """Parallel version of set_dataframe_from_filepath, every worker parses one byte range of the file."""
+        columns, field_indices, chunks = await self.run_on_ranges(
+            read_csv_range, self.parsing_engine, self.replace_linebreaks, self.string_storage
+        )
+        self.dataframe = (await self.worker_pool.run(partial(pd.concat, chunks, ignore_index=True)) if chunks
+                          else pd.DataFrame(columns=field_indices))
+        self.dataframe.columns = columns
         self.dataframe_length = len(self.dataframe)
+        self.metrics.advance(rows=self.dataframe_length)
 
     def set_encoding(self, encoding: str) -> None:
         """Set file decoding for import of csv. Defaults to latin_1 if some invalid encoding is provided."""
@@ -152,89 +1640,543 @@ class FileHandler:
         else:
             self.encoding = encoding
 
+    @queued_operation
+    async def detect_file_format(self) -> dict:
+        """Sniffs the encoding, the separator and the header of the file from a byte sample and sets them, see
+        sniff_csv_format."""
+        self.detected_format = await self.worker_pool.run(sniff_csv_format, self.path)
+        self.set_encoding(self.detected_format['encoding'])
+        self.seperator = self.detected_format['separator']
+        self.toggle_header_mode(self.detected_format['header'])
+        return self.detected_format
+
     def update_check_values_and_regex(self) -> None:
         """Updates the characters to check the df for and build the regex pattern for lookup of multiple chars using
-        | (or)"""
-        self.check_chars = list(set(self.check_char_user_input.split(" ")))
+        | (or). self.check_chars keeps the literal characters for the counting engine."""
+        # dict.fromkeys drops duplicates but keeps the order the user typed the characters in
+        self.check_chars = list(dict.fromkeys(self.check_char_user_input.split(" ")))
         # in case the user has a trailing space we get an empty string in the list, this removes that:
         if '' in self.check_chars:
             self.check_chars.remove('')
-        new_chars = []
-        # escape characters which need to be escaped in regex (pop old one from list, add escaped version)
-        for c in self.check_chars:
-            if c in characters_to_escape_in_regex:
-                c_new = escape(c)
-                self.check_chars.remove(c)
-                new_chars.append(c_new)
-        self.check_chars += new_chars
-        # build regex with or (|) from character list > this will match all characters specified
-        for c in self.check_chars:
-            self.check_chars_regex = '|'.join(self.check_chars)
+        # build regex with or (|) from the escaped character list > this will match all characters specified
+        self.check_chars_regex = '|'.join(escape(c) for c in self.check_chars)
+
+    def set_analysis_results(self, row_counts: dict, char_counts: dict, match_index: dict = None,
+                             match_offsets: dict = None) -> None:
+        """Saves the row count and the percentage of total rows of every column with matches for later use, as well as
+        the break down of the matches by character and the match index for the preview."""
+        self.cols_with_char = {}
+        self.char_counts = {}
+        self.match_index = {}
+        self.match_offsets = {}
+        for col, count in row_counts.items():
+            if count > 0:
+                self.cols_with_char[col] = (count, f"{count/self.dataframe_length * 100:.2f}%")
+                self.char_counts[col] = char_counts[col]
+                if match_index is not None:
+                    self.match_index[col] = match_index[col]
+                if match_offsets is not None:
+                    self.match_offsets[col] = match_offsets[col]
+
+    async def get_chars_to_scan(self) -> list:
+        """Returns the check characters which have not been counted for the current file and settings yet. Results per
+        character are kept in memory and in the on disk cache, so changing the character input only scans the file for
+        the new characters."""
+        cache_key = self.cache.get_key(self)
+        if cache_key != self.char_matches_key:
+            # other file or settings, the counted characters are of no use any more
+            self.char_matches = {}
+            self.char_matches_key = cache_key
+        chars_to_scan = [char for char in self.check_chars if char not in self.char_matches]
+        if self.use_cache:
+            for char in list(chars_to_scan):
+                cached = await self.worker_pool.run(self.cache.load_char_matches, cache_key, char)
+                if cached is not None:
+                    self.dataframe_length, self.char_matches[char] = cached
+                    chars_to_scan.remove(char)
+        return chars_to_scan
+
+    async def add_char_matches(self, char_matches: dict) -> None:
+        """Keeps the results of newly counted characters, in memory and in the on disk cache."""
+        self.char_matches.update(char_matches)
+        if self.use_cache:
+            for char, matches in char_matches.items():
+                await self.worker_pool.run(self.cache.store_char_matches, self.char_matches_key, char,
+                                           self.dataframe_length, matches)
 
+    def set_combined_analysis_results(self) -> None:
+        """Combines the results of the single characters into the results for the current check characters."""
+        self.set_analysis_results(*combine_char_matches(self.char_matches, self.check_chars))
+
+    @queued_operation
     async def analyze_dataframe(self) -> None:
         """Checks all columns in the dataframe for occurances of the specified characters; info on which columns contain
         the chars and how often."""
-        # for col in self.dataframe:
-        #     filtered_df = self.dataframe[self.dataframe[col].astype(str).str.contains(self.check_char, na=False)]
-        #     if not filtered_df.empty:
-        #         self.cols_with_char[col] = len(filtered_df)
-        # the above was my own code, the following is chat gpt. i could not get this func to work with io_bound or
-        # cpu_bound from nicegui without it breaking on larger sets. this seems to work, but i am not sure wtf is going on
-        self.cols_with_char = {}
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            loop = get_running_loop()
-            for col in self.dataframe:
-                filtered_df = await loop.run_in_executor(
-                    executor,
-                    # search the dataframe for the specified regex build from user character choice
-                    lambda col=col: self.dataframe[
-                        self.dataframe[col].astype(str).str.contains(self.check_chars_regex, na=False, regex=True)]
+        with self.start_stage('analyze', total_columns=len(self.dataframe.columns)) as metrics:
+            chars_to_scan = await self.get_chars_to_scan()
+            metrics.method = 'dataframe' if chars_to_scan else 'cache'
+            if chars_to_scan:
+                # the columns are counted in the worker pool, without it the ui loses connection on larger sets.
+                char_matches = {char: {} for char in chars_to_scan}
+                for col in self.dataframe:
+                    started = perf_counter()
+                    col_matches = await self.worker_pool.run(count_chars_in_column, self.dataframe[col], chars_to_scan)
+                    for char, (positions, occurances) in col_matches.items():
+                        char_matches[char][col] = (positions, occurances, None)
+                    metrics.column_done(col, perf_counter() - started)
+                    self.worker_pool.check()
+                self.dataframe_length = len(self.dataframe)
+                await self.add_char_matches(char_matches)
+            metrics.advance(rows=self.dataframe_length)
+            self.set_combined_analysis_results()
+
+    @queued_operation
+    async def analyze_file_streaming(self) -> None:
+        """Checks all columns of the csv file for occurances of the specified characters while the file is read chunk by
+        chunk. Only one chunk is held in memory at a time. With the mmap engine the raw bytes are scanned instead, if
+        the encoding allows for it."""
+        with self.start_stage('analyze', total_bytes=self.get_file_size()) as metrics:
+            chars_to_scan = await self.get_chars_to_scan()
+            if chars_to_scan:
+                if self.parallel_mode and can_split_bytes(self.encoding, self.seperator):
+                    metrics.method = 'parallel'
+                    char_matches = await self.analyze_file_parallel(chars_to_scan)
+                elif self.parsing_engine == 'mmap' and can_scan_bytes(self.encoding, self.seperator, chars_to_scan):
+                    metrics.method = 'bytes'
+                    char_matches = await self.analyze_file_bytes(chars_to_scan)
+                else:
+                    # also the fallback if the encoding or the separator can't be searched for as bytes
+                    metrics.method = 'chunks'
+                    char_matches = await self.analyze_file_chunks(chars_to_scan)
+                await self.add_char_matches(char_matches)
+            else:
+                metrics.method = 'cache'
+                metrics.advance(rows=self.dataframe_length)
+            self.set_combined_analysis_results()
+
+    async def analyze_file_chunks(self, check_chars: list, columns: list = None) -> dict:
+        """Counts the characters in the pandas chunks of the file, in all columns or only in columns. Returns
+        {char: {column: (positions, occurances, None)}}."""
+        positions = {char: {} for char in check_chars}
+        occurances = {char: {} for char in check_chars}
+        row_count = 0
+        with open(self.path, 'r', encoding=self.encoding) as file:
+            chunks_iter = await self.get_chunks_iter(file, columns)
+            # reading and searching the chunks is done in the worker pool so the ui does not lose connection while we
+            # walk through big files.
+            while True:
+                chunk = await self.worker_pool.run(self.read_clean_chunk, chunks_iter)
+                if chunk is None:
+                    break
+                for col in chunk:
+                    started = perf_counter()
+                    col_matches = await self.worker_pool.run(count_chars_in_column, chunk[col], check_chars)
+                    for char, (chunk_positions, chunk_occurances) in col_matches.items():
+                        # positions within the chunk are moved by the rows of the previous chunks
+                        positions[char].setdefault(col, []).append(chunk_positions + row_count)
+                        occurances[char][col] = occurances[char].get(col, 0) + chunk_occurances
+                    self.metrics.column_seconds[col] = (self.metrics.column_seconds.get(col, 0.0)
+                                                        + perf_counter() - started)
+                row_count += len(chunk)
+                self.advance_chunk_metrics(file, len(chunk))
+        self.dataframe_length = row_count
+        return {char: {col: (np.concatenate(col_positions), occurances[char][col], None)
+                       for col, col_positions in positions[char].items()}
+                for char in check_chars}
+
+    def get_byte_char_matches(self, columns: list, field_indices: list, check_chars: list, matches: dict) -> dict:
+        """Turns the result of count_chars_in_byte_range, which is keyed by field index and pattern, into
+        {char: {column: (positions, occurances, offsets)}}."""
+        return {char: {col: (np.asarray(matches[i][j][0], dtype=np.int64), matches[i][j][2],
+                             None if matches[i][j][1] is None else np.asarray(matches[i][j][1], dtype=np.int64))
+                       for col, i in zip(columns, field_indices)}
+                for j, char in enumerate(check_chars)}
+
+    async def analyze_file_bytes(self, check_chars: list, columns: list = None) -> dict:
+        """Checks all columns (or only columns) of the csv file for occurances of the specified characters on the memory
+        mapped raw bytes, without parsing the file with pandas."""
+        dialect = get_byte_dialect(self.encoding, self.seperator)
+        patterns = get_byte_patterns(self.encoding, check_chars)
+        with open(self.path, 'rb') as file:
+            if file.seek(0, 2) == 0:
+                raise ValueError("No columns to parse from file")
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                all_columns, all_field_indices, data_start = read_csv_header_bytes(
+                    buffer, self.encoding, dialect, self.file_header, self.supress_unnamed_columns
                 )
-                # if the filtered dataset is not empty, we save its row count and percentage of total rows for later use
-                if not filtered_df.empty:
-                    len_df = len(filtered_df)
-                    self.cols_with_char[col] = (len_df, f"{len_df/self.dataframe_length * 100:.2f}%")
+                self.field_indices = dict(zip(all_columns, all_field_indices))
+                if columns is None:
+                    columns = all_columns
+                field_indices = [self.field_indices[col] for col in columns]
+                self.metrics.advance(bytes_read=data_start)
+                # a cancel raises in the progress callback, so the scan has stopped before the buffer is closed
+                self.dataframe_length, matches = await self.worker_pool.run(
+                    count_chars_in_byte_range, buffer, data_start, len(buffer), dialect, field_indices, patterns,
+                    self.replace_linebreaks, self.advance_block_metrics
+                )
+        return self.get_byte_char_matches(columns, field_indices, check_chars, matches)
 
-    def get_filtered_rows(self, column_name: str ,head: int = DEFAULT_DF_HEAD) -> pd.DataFrame:
-        """returns the top x rows (head, default 10) of the dataframe filtered on column column_name and on the chars
-        in self.check_chars_regex"""
-        return self.dataframe[
-            self.dataframe[column_name].astype(str).str.contains(self.check_chars_regex, na=False)].head(head)
+    async def analyze_file_parallel(self, check_chars: list) -> dict:
+        """Parallel version of analyze_file_streaming, every worker analyzes one byte range of the file. The results of
+        the ranges are put together in file order."""
+        columns, field_indices, results = await self.run_on_ranges(
+            analyze_csv_range, check_chars, self.parsing_engine, self.replace_linebreaks, self.string_storage
+        )
+        row_count = 0
+        matches = {i: [[[], [], 0] for _ in check_chars] for i in field_indices}
+        for range_rows, range_matches in results:
+            for i in field_indices:
+                for total, (rows, offsets, occurances) in zip(matches[i], range_matches[i]):
+                    # the rows of a range are counted from its start
+                    total[0].append(np.asarray(rows, dtype=np.int64) + row_count)
+                    if offsets is None or total[1] is None:
+                        total[1] = None
+                    else:
+                        total[1].append(np.asarray(offsets, dtype=np.int64))
+                    total[2] += occurances
+            row_count += range_rows
+        self.metrics.advance(rows=row_count)
+        for i in field_indices:
+            for total in matches[i]:
+                total[0] = np.concatenate(total[0]) if total[0] else np.array([], dtype=np.int64)
+                if total[1] is not None:
+                    total[1] = np.concatenate(total[1]) if total[1] else np.array([], dtype=np.int64)
+        self.dataframe_length = row_count
+        self.field_indices = dict(zip(columns, field_indices))
+        return self.get_byte_char_matches(columns, field_indices, check_chars, matches)
 
+    @queued_operation
+    async def quick_scan(self) -> None:
+        """Estimates the share of rows containing the check characters per column from a sample of sample_size records,
+        which are read at random byte offsets of the file without parsing the rest of it. Sets sample_estimates to
+        {column: {'sample_rows', 'matching_rows', 'share', 'low', 'high', 'chars'}} with the wilson interval of the
+        share, and the estimated row count of the file. Only for encodings the records can be split in as bytes."""
+        if not can_split_bytes(self.encoding, self.seperator):
+            raise ValueError(f"The quick scan can't split {self.encoding} files into records, use the full analysis.")
+        dialect = get_byte_dialect(self.encoding, self.seperator)
+        with self.start_stage('quick_scan', total_bytes=self.get_file_size()) as metrics, \
+                open(self.path, 'rb') as file:
+            metrics.method = self.sample_method
+            if file.seek(0, 2) == 0:
+                raise ValueError("No columns to parse from file")
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                columns, field_indices, data_start = await self.worker_pool.run(
+                    read_csv_header_bytes, buffer, self.encoding, dialect, self.file_header,
+                    self.supress_unnamed_columns
+                )
+                self.field_indices = dict(zip(columns, field_indices))
+                sample = await self.worker_pool.run(
+                    sample_csv_records, buffer, data_start, len(buffer), dialect, int(self.sample_size),
+                    self.sample_method, np.random.default_rng()
+                )
+                data_bytes = len(buffer) - data_start
+            sample_bytes = sum(len(record) + len(dialect['newline']) for _, record in sample)
+            metrics.advance(bytes_read=sample_bytes, rows=len(sample), chunks=1)
+            # the mean length of the sampled records tells how many records fit into the file
+            self.estimated_rows = round(data_bytes * len(sample) / sample_bytes) if sample else 0
+            sample_df = self.parse_records([record for _, record in sample], range(len(sample)))
+            sample_matches = {char: {} for char in self.check_chars}
+            for col in sample_df:
+                col_matches = await self.worker_pool.run(count_chars_in_column, sample_df[col], self.check_chars)
+                for char, (positions, occurances) in col_matches.items():
+                    sample_matches[char][col] = (positions, occurances, None)
+                self.worker_pool.check()
+            row_counts, char_counts, _, _ = combine_char_matches(sample_matches, self.check_chars)
+            self.sample_estimates = {}
+            for col in sample_df:
+                matching_rows = row_counts.get(col, 0)
+                low, high = wilson_interval(matching_rows, len(sample))
+                self.sample_estimates[col] = {
+                    'sample_rows': len(sample),
+                    'matching_rows': matching_rows,
+                    'share': matching_rows / len(sample) if sample else 0.0,
+                    'low': low,
+                    'high': high,
+                    'chars': char_counts.get(col, {}),
+                }
+
+    @queued_operation
+    async def analyze_columns(self, columns: list) -> dict:
+        """Exact analysis of some columns, to check the estimates of the quick scan. The loaded dataframe is counted if
+        there is one, else the file is read with the byte scanner or in chunks limited to the columns. Returns
+        {column: (matching rows, percentage of rows)} and adds it to sample_estimates as 'exact'."""
+        with self.start_stage('analyze', total_bytes=0 if not self.dataframe.empty else self.get_file_size(),
+                              total_columns=len(columns)) as metrics:
+            if not self.dataframe.empty:
+                metrics.method = 'dataframe'
+                char_matches = {char: {} for char in self.check_chars}
+                for col in columns:
+                    started = perf_counter()
+                    col_matches = await self.worker_pool.run(count_chars_in_column, self.dataframe[col],
+                                                             self.check_chars)
+                    for char, (positions, occurances) in col_matches.items():
+                        char_matches[char][col] = (positions, occurances, None)
+                    metrics.column_done(col, perf_counter() - started)
+                    self.worker_pool.check()
+                self.dataframe_length = len(self.dataframe)
+                metrics.advance(rows=self.dataframe_length)
+            elif can_scan_bytes(self.encoding, self.seperator, self.check_chars):
+                metrics.method = 'bytes'
+                char_matches = await self.analyze_file_bytes(self.check_chars, columns)
+            else:
+                metrics.method = 'chunks'
+                # without header pandas names the columns by their field index, which usecols takes as well
+                char_matches = await self.analyze_file_chunks(self.check_chars, columns)
+        row_counts, _, _, _ = combine_char_matches(char_matches, self.check_chars)
+        exact = {}
+        for col in columns:
+            count = row_counts.get(col, 0)
+            exact[col] = (count, f"{count / self.dataframe_length * 100:.2f}%" if self.dataframe_length else "0.00%")
+            if col in self.sample_estimates:
+                self.sample_estimates[col]['exact'] = exact[col]
+        return exact
+
+    @queued_operation
+    async def validate_file(self) -> dict:
+        """Checks the structure of the raw file in one pass, without parsing it with pandas: the distribution of the
+        field counts, ragged records (which pandas rejects or shifts into other columns), unbalanced quotes, line
+        breaks within values and stray quotes within unquoted values. Sets validation to the summary and flagged_records
+        to the index of the flagged records, so they can be previewed and exported without reading the file again."""
+        if not can_split_bytes(self.encoding, self.seperator):
+            raise ValueError(f"The validation can't split {self.encoding} files into records.")
+        dialect = get_byte_dialect(self.encoding, self.seperator)
+        with self.start_stage('validate', total_bytes=self.get_file_size()) as metrics, \
+                open(self.path, 'rb') as file:
+            metrics.method = 'bytes'
+            if file.seek(0, 2) == 0:
+                raise ValueError("No columns to parse from file")
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                # the header, or the first record of files without header, tells the expected field count
+                columns, _, data_start = read_csv_header_bytes(buffer, self.encoding, dialect, self.file_header, False)
+                first_line = buffer[:data_start].count(dialect['newline']) + 1
+                metrics.advance(bytes_read=data_start)
+                result = await self.worker_pool.run(
+                    validate_byte_range, buffer, data_start, len(buffer), dialect, len(columns), first_line,
+                    self.advance_block_metrics
+                )
+        issues = result['issues']
+        self.flagged_records = {key: result[key] for key in ('offsets', 'lines_of_records', 'fields', 'issues')}
+        self.validation = {
+            'records': result['records'],
+            'lines': result['lines'],
+            'expected_fields': len(columns),
+            # a list instead of a dict, json would turn the field counts into strings
+            'field_counts': sorted(result['field_counts'].items()),
+            'ragged': int(np.count_nonzero(issues & RECORD_RAGGED)),
+            'unbalanced_quotes': int(np.count_nonzero(issues & RECORD_UNBALANCED_QUOTES)),
+            'embedded_newlines': int(np.count_nonzero(issues & RECORD_EMBEDDED_NEWLINE)),
+            'stray_quotes': int(np.count_nonzero(issues & RECORD_STRAY_QUOTE)),
+            'bad_records': self.get_flagged_count(),
+            'data_start': data_start,
+        }
+        return self.validation
+
+    def get_flagged_count(self, issues: int = BAD_RECORD_ISSUES) -> int:
+        if not self.flagged_records:
+            return 0
+        return int(np.count_nonzero(self.flagged_records['issues'] & issues))
+
+    def read_flagged_records(self, positions):
+        """Yields the raw flagged records at the positions of the index, cut at VALIDATION_MAX_RECORD_BYTES. A record
+        with an unbalanced quote runs to the end of the file, the line break which ends the file is not part of it."""
+        dialect = get_byte_dialect(self.encoding, self.seperator)
+        with open(self.path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for offset in self.flagged_records['offsets'][positions]:
+                record = read_record_at(buffer, int(offset), dialect, VALIDATION_MAX_RECORD_BYTES)
+                if record is None:
+                    record = buffer[offset:offset + VALIDATION_MAX_RECORD_BYTES]
+                if offset + len(record) == len(buffer) and record.endswith(dialect['newline']):
+                    record = record[:-len(dialect['newline'])]
+                    if record.endswith(dialect['cr']):
+                        record = record[:-len(dialect['cr'])]
+                yield record[:VALIDATION_MAX_RECORD_BYTES]
+
+    def get_flagged_rows(self, page: int = 0, page_size: int = DEFAULT_DF_HEAD,
+                         issues: int = BAD_RECORD_ISSUES) -> pd.DataFrame:
+        """Returns one page of the flagged records with their line, byte offset, field count, issues and the raw record
+        as text. The records are not parsed, a ragged record does not fit into the columns."""
+        positions = np.flatnonzero(self.flagged_records['issues'] & issues)[page * page_size:(page + 1) * page_size]
+        encoding = 'utf_8' if self.encoding == 'utf_8_sig' else self.encoding
+        return pd.DataFrame({
+            'line': self.flagged_records['lines_of_records'][positions],
+            'offset': self.flagged_records['offsets'][positions],
+            'fields': self.flagged_records['fields'][positions],
+            'issues': [get_issue_names(flags) for flags in self.flagged_records['issues'][positions]],
+            'record': [record.decode(encoding, errors='replace') for record in self.read_flagged_records(positions)],
+        })
+
+    @queued_operation
+    async def export_flagged_records(self, export_path: str, issues: int = BAD_RECORD_ISSUES) -> Path:
+        """Writes the raw bytes of the flagged records to a file of their own, below the original header, so they can
+        be fixed by hand. Records are cut like in the preview. Returns the path of the file."""
+        export_path_with_file = self.get_export_path(export_path, '_bad_rows')
+        positions = np.flatnonzero(self.flagged_records['issues'] & issues)
+        newline = get_byte_dialect(self.encoding, self.seperator)['newline']
+
+        def write_records():
+            with open(self.path, 'rb') as file, open(export_path_with_file, 'xb') as target:
+                # everything in front of the first record: BOM and header
+                target.write(file.read(self.validation['data_start']))
+                for record in self.read_flagged_records(positions):
+                    target.write(record + newline)
+
+        with self.start_stage('export') as metrics:
+            metrics.method = 'bad_rows'
+            await self.worker_pool.run(write_records)
+            metrics.advance(rows=len(positions), chunks=1)
+        return export_path_with_file
+
+    def get_match_count(self, column_name: str) -> int:
+        return self.cols_with_char.get(column_name, (0,))[0]
+
+    def get_filtered_rows(self, column_name: str, page: int = 0, page_size: int = DEFAULT_DF_HEAD) -> pd.DataFrame:
+        """returns one page (page_size rows, default 10) of the rows of the dataframe matching the chars in column
+        column_name. The rows are looked up in the match index of the analysis, so a page costs the same no matter how
+        big the file is."""
+        start = page * page_size
+        if not self.dataframe.empty:
+            if column_name not in self.match_index:
+                # analysis results from the cache come without index, we build it for this column once
+                self.match_index[column_name] = np.flatnonzero(
+                    self.dataframe[column_name].str.contains(self.check_chars_regex, na=False))
+            return self.dataframe.iloc[self.match_index[column_name][start:start + page_size]]
+        if column_name in self.match_offsets:
+            # the file is not in memory, the byte scanner saved where the matching records start
+            return self.read_records_at_offsets(self.match_offsets[column_name][start:start + page_size],
+                                                self.match_index[column_name][start:start + page_size])
+        raise ValueError("No data to preview, the file is not in memory and the analysis did not save record offsets.")
+
+    def read_records_at_offsets(self, offsets, rows) -> pd.DataFrame:
+        """Reads and parses the records starting at the byte offsets, indexed by their row numbers."""
+        dialect = get_byte_dialect(self.encoding, self.seperator)
+        with open(self.path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            records = [read_record_at(buffer, int(offset), dialect) for offset in offsets]
+        return self.parse_records(records, rows)
+
+    def parse_records(self, records: list, rows) -> pd.DataFrame:
+        """Parses raw records with pandas into the columns of field_indices, indexed by rows."""
+        dialect = get_byte_dialect(self.encoding, self.seperator)
+        columns = list(self.field_indices)
+        if not records:
+            return pd.DataFrame(columns=columns)
+        encoding = 'utf_8' if self.encoding == 'utf_8_sig' else self.encoding
+        page = pd.read_csv(BytesIO(dialect['newline'].join(records)), sep=self.seperator, encoding=encoding,
+                           header=None, dtype=get_string_dtype(self.string_storage), na_values='',
+                           usecols=list(self.field_indices.values()), skip_blank_lines=False)
+        page.columns = columns
+        page.index = rows
+        return apply_substitutions(page, get_substitutions(self.replace_linebreaks))
+
+    @queued_operation
     async def transform_df(self, char_out: str, char_in: str) -> None:
         """Prepares a transformed dataframe which is a copy of the initial dataframe loaded to the fileHanlder but with
-        the specified character substituted out."""
-        char_out = escape(char_out)
-        self.transformed_df = self.dataframe.replace({char_out: char_in}, regex=True)
+        the specified character substituted out. Line breaks were already deleted while loading."""
+        self.transformed_df = await self.worker_pool.run(
+            apply_substitutions, self.dataframe, get_substitutions(False, char_out, char_in)
+        )
 
-    async def export_file(self, export_path: str, separator: str) -> None:
-        """Saves the transformed dataframe to disc as .csv."""
+    def get_export_path(self, export_path: str, name_suffix: str = '', export_format: str = 'csv') -> Path:
+        """Builds the path of the export file: the name of the loaded file with name_suffix and a timestamp, within
+        export_path. The extension is the one of the file for csv, with .gz or .zst for the compressed csv."""
         timestamp = datetime.now().strftime('%Y_%m_%d %H_%M_%S')
-        file_name = f"{self.path.stem}_{timestamp}"
+        file_name = f"{self.path.stem}{name_suffix}_{timestamp}"
         file_suffix = self.path.suffix # should be .csv anyhow
-        export_path_with_file = f"{export_path}/{file_name}{file_suffix}"
+        if export_format in ('parquet', 'feather'):
+            file_suffix = f".{export_format}"
+        elif export_format != 'csv':
+            file_suffix += f".{export_format.split('.')[1]}"
+        return Path(f"{export_path}/{file_name}{file_suffix}")
+
+    def get_export_header(self, columns):
+        """Returns the header for to_csv, False if the file was loaded without headers."""
         if self.file_header is None:
-            has_header = False
-        else:
-            has_header = [str(col) for col in self.transformed_df.columns]
+            return False
+        return [str(col) for col in columns]
+
+    async def write_export_chunks(self, target, separator: str, read_chunk) -> None:
+        """Writes the chunks read_chunk returns (None at the end, called in the pool) to the binary target in the export
+        format. Up to worker_count chunks are formatted and compressed in the pool at once, while one write at a time
+        appends them to the target in order, see ExportWriter."""
+        writer = None
+        prepared = deque() # prepared chunks in file order, still running or done
+        pending_write = None
+        is_first_chunk = True
+        try:
+            while True:
+                chunk = await self.worker_pool.run(read_chunk)
+                self.worker_pool.check()
+                if chunk is not None:
+                    if writer is None:
+                        writer = ExportWriter(target, self.export_format, self.encoding, separator, chunk.columns,
+                                              self.get_export_header(chunk.columns))
+                    prepared.append(self.worker_pool.run(writer.prepare, chunk, is_first_chunk))
+                    is_first_chunk = False
+                # the oldest chunk is written once enough chunks are in the works, at the end all of them
+                while prepared and (chunk is None or len(prepared) >= int(self.worker_count)):
+                    data = await prepared.popleft()
+                    if pending_write is not None:
+                        await pending_write
+                    pending_write = self.worker_pool.run(writer.write, data)
+                if chunk is None:
+                    break
+            if pending_write is not None:
+                await pending_write
+        finally:
+            # nothing may touch the target once it is closed, or deleted after a cancel
+            if pending_write is not None and not pending_write.done():
+                await wait([pending_write])
+            if writer is not None:
+                writer.close()
+
+    async def write_export(self, export_path: str, separator: str, read_chunk) -> Path:
+        """Creates the export file for the export format and writes the chunks to it. The incomplete file is deleted if
+        the export fails or is cancelled."""
+        export_path_with_file = self.get_export_path(export_path, export_format=self.export_format)
+        target = open(export_path_with_file, 'xb')
+        try:
+            with target:
+                await self.write_export_chunks(target, separator, read_chunk)
+        except BaseException:
+            export_path_with_file.unlink(missing_ok=True)
+            raise
+        return export_path_with_file
+
+    @queued_operation
+    async def export_file(self, export_path: str, separator: str) -> Path:
+        """Saves the transformed dataframe to disc in the export format, in chunks of chunk_size rows."""
         # currently we loose the quoting around values if it is not needed, even when it is present in the initial
         # file. I am not sure if that is a plus or minus..
-        # wrapped this in the same concurrent.futures routine as the analyzing above to not let the ui lose connection
-        # connection loss still happens, but it seems that the UI can reconnect when we use this.
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            loop = get_running_loop()
-            await loop.run_in_executor(
-                executor,
-                lambda: self.transformed_df.to_csv(
-                            Path(export_path_with_file),
-                            sep=separator,
-                            header=has_header,
-                            index=False,
-                            encoding=self.encoding,
-                            mode='x',
-                            quotechar='"'
-                )
-            )
+        # an empty dataframe is one empty chunk, so the header is written anyway
+        chunks = (self.transformed_df.iloc[start:start + int(self.chunk_size)]
+                  for start in range(0, max(len(self.transformed_df), 1), int(self.chunk_size)))
+
+        def read_chunk():
+            chunk = next(chunks, None)
+            if chunk is not None:
+                self.metrics.advance(rows=len(chunk), chunks=1)
+            return chunk
+
+        with self.start_stage('export') as metrics:
+            metrics.method = 'dataframe'
+            return await self.write_export(export_path, separator, read_chunk)
+
+    @queued_operation
+    async def export_file_streaming(self, export_path: str, separator: str, char_out: str, char_in: str) -> Path:
+        """Reads the csv file chunk by chunk, swaps the specified character out and appends each chunk to the export
+        file. Only the chunks which are being prepared and written are held in memory."""
+        with self.start_stage('export', total_bytes=self.get_file_size()) as metrics, \
+                open(self.path, 'r', encoding=self.encoding) as file:
+            metrics.method = 'chunks'
+            chunks_iter = await self.get_chunks_iter(file)
+
+            def read_chunk():
+                # line breaks and the swap in one pass over the chunk
+                chunk = self.read_clean_chunk(chunks_iter, char_out, char_in)
+                if chunk is not None:
+                    metrics.advance(bytes_read=file.buffer.tell() - metrics.bytes_read, rows=len(chunk), chunks=1)
+                return chunk
+
+            return await self.write_export(export_path, separator, read_chunk)
 
 
 async def load_file_and_set_dataframe() -> None:
@@ -259,18 +2201,31 @@ async def load_file_and_set_dataframe() -> None:
     except Exception as e:
         ui.notify(f"Path couldn't be set. \n {e}")
         return
-    try:
-        await fileHandler.set_dataframe_from_filepath()
-    except Exception as e:
-        ui.notify(f"Dataframe couldn't be build. \n {e}")
-        return
+    if fileHandler.auto_detect_format:
+        try:
+            detected = await fileHandler.detect_file_format()
+        except Exception as e:
+            ui.notify(f"Format couldn't be detected, the settings are kept. \n {e}")
+        else:
+            # the encoding and the separator are bound, the header checkbox sets the header mode on change
+            file_has_headers.value = detected['header']
+            ui.notify(f"Detected {detected['encoding']}, separator {detected['separator']!r}, "
+                      f"{'with' if detected['header'] else 'without'} header, {detected['field_count']} columns.")
+    if not fileHandler.streaming_mode:
+        # in streaming mode the file is only read when it is analyzed
+        try:
+            await fileHandler.set_dataframe_from_filepath()
+        except Exception as e:
+            ui.notify(f"Dataframe couldn't be build. \n {e}")
+            loading_spinner_file.set_visibility(False)
+            path_label.set_visibility(True)
+            return
     await sleep(0.1)
     analyze_button.set_visibility(True)
     loading_spinner_file.set_visibility(False)
     path_label.set_visibility(True)
     path_label.text = str(fileHandler.path)
-    df_shape = fileHandler.dataframe.shape
-    file_exp.text = f"File: {df_shape[1]} cols, {df_shape[0]} rows"
+    update_file_info()
     loading_spinner_file.update()
     analyze_button.update()
     path_label.update()
@@ -289,7 +2244,16 @@ async def reload_file_and_dataframe() -> None:
         # we need this so the control is yielded back to the event loop and the ui is updated, without this the spinner is
         # not shown.
         await sleep(0.1)
-        await fileHandler.set_dataframe_from_filepath()
+        if fileHandler.streaming_mode:
+            fileHandler.dataframe = pd.DataFrame([])
+        else:
+            try:
+                await fileHandler.set_dataframe_from_filepath()
+            except Exception as e:
+                ui.notify(f"Dataframe couldn't be build. \n {e}")
+                loading_spinner_file.set_visibility(False)
+                path_label.set_visibility(True)
+                return
         analyze_button.set_visibility(True)
         analyze_button.update()
         loading_spinner_file.set_visibility(False)
@@ -297,13 +2261,25 @@ async def reload_file_and_dataframe() -> None:
         result_table.set_visibility(False)
         data_table.set_visibility(False)
         data_label.set_visibility(False)
-        df_shape = fileHandler.dataframe.shape
-        file_exp.text = f"File: {df_shape[1]} cols, {df_shape[0]} rows"
-        file_exp.update()
+        update_file_info()
     else:
         ui.notify("No file loaded.")
 
 
+def update_file_info() -> None:
+    """Shows the shape of the loaded dataframe in the file expansion. In streaming mode the dataframe is not kept in
+    memory, so we only know the row count after the file was analyzed."""
+    if fileHandler.streaming_mode:
+        if fileHandler.dataframe_length:
+            file_exp.text = f"File: streaming mode, {fileHandler.dataframe_length} rows"
+        else:
+            file_exp.text = "File: streaming mode"
+    else:
+        df_shape = fileHandler.dataframe.shape
+        file_exp.text = f"File: {df_shape[1]} cols, {df_shape[0]} rows"
+    file_exp.update()
+
+
 async def choose_file() -> str:
     file_types = ('CSV Files (*.csv)', 'All files (*.*)') # for some reason i can not only use the CSV part here. idk..
     # this always returns a list of files even when only 1 is chosen.
@@ -322,8 +2298,13 @@ async def transform_and_save_file() -> None:
     target_path = await app.native.main_window.create_file_dialog(allow_multiple=False, file_types=file_types, dialog_type=webview.FOLDER_DIALOG)
     target_path = target_path[0] # create_file_dialog returns a list, we only want the first entry
     try:
-        await fileHandler.transform_df(swap_out_character.value, swap_in_character.value)
-        await fileHandler.export_file(target_path, export_separator.value)
+        if fileHandler.streaming_mode:
+            # the file is not in memory, we read, swap and write it chunk by chunk
+            exported = await fileHandler.export_file_streaming(target_path, export_separator.value,
+                                                               swap_out_character.value, swap_in_character.value)
+        else:
+            await fileHandler.transform_df(swap_out_character.value, swap_in_character.value)
+            exported = await fileHandler.export_file(target_path, export_separator.value)
     except Exception as e:
         ui.notify(e)
         export_spinner.set_visibility(False)
@@ -332,7 +2313,7 @@ async def transform_and_save_file() -> None:
     await sleep(0.1)
     export_spinner.set_visibility(False)
     download_and_swap_button.set_visibility(True)
-    ui.notify("File exported successfully.")
+    ui.notify(f"File exported successfully to {exported.name}.")
 
 
 def kill_script() -> None:
@@ -348,31 +2329,148 @@ async def analyzer_click() -> None:
         data_table.set_visibility(False)
         analyze_button.set_visibility(False)
         loading_spinner_analyzer.set_visibility(True)
-        await fileHandler.analyze_dataframe()
+        if fileHandler.streaming_mode or fileHandler.parsing_engine == 'mmap':
+            await fileHandler.analyze_file_streaming()
+            update_file_info()
+        else:
+            await fileHandler.analyze_dataframe()
         populate_result_table()
-        loading_spinner_analyzer.set_visibility(False)
-        analyze_button.set_visibility(True)
     except Exception as e:
         ui.notify(e)
+    finally:
+        loading_spinner_analyzer.set_visibility(False)
+        analyze_button.set_visibility(True)
 
 
 def populate_result_table() -> None:
     columns = [
         {'name': 'column', 'label': 'Column', 'field': 'column', 'required': True, 'align': 'left'},
         {'name': 'count', 'label': 'Count of char', 'field': 'count', 'required': True, 'align': 'left'},
-        {'name': 'perc_of_rows', 'label': 'Percentage of rows', 'field': 'perc_of_rows', 'required': True, 'align': 'left'}
+        {'name': 'perc_of_rows', 'label': 'Percentage of rows', 'field': 'perc_of_rows', 'required': True, 'align': 'left'},
+        {'name': 'occurances', 'label': 'Occurances', 'field': 'occurances', 'required': True, 'align': 'left'},
+        {'name': 'per_char', 'label': 'Rows per char', 'field': 'per_char', 'required': True, 'align': 'left'}
     ]
     rows = []
     for key, value in fileHandler.cols_with_char.items():
-        rows.append({'column': key, 'count': value[0], 'perc_of_rows': value[1]})
+        char_counts = fileHandler.char_counts.get(key, {})
+        occurances = sum(occ for _, occ in char_counts.values())
+        per_char = ', '.join(f"'{char}': {rows_with_char}" for char, (rows_with_char, _) in char_counts.items()
+                             if rows_with_char)
+        rows.append({'column': key, 'count': value[0], 'perc_of_rows': value[1], 'occurances': occurances,
+                     'per_char': per_char})
     result_table.columns = columns
     result_table.rows = rows
     result_table.update()
     result_table.set_visibility(True)
 
-def drop_file_and_dataframe() -> None:
+async def quick_scan_click() -> None:
+    if fileHandler.path is None:
+        ui.notify("No file loaded.")
+        return
+    quick_scan_button.disable()
+    try:
+        await fileHandler.quick_scan()
+    except Exception as e:
+        ui.notify(e)
+        return
+    finally:
+        quick_scan_button.enable()
+    populate_sample_table()
+
+
+async def full_scan_click() -> None:
+    columns = [row['column'] for row in sample_table.selected]
+    if not columns:
+        ui.notify("Select the columns to scan in the table.")
+        return
+    full_scan_button.disable()
+    try:
+        await fileHandler.analyze_columns(columns)
+    except Exception as e:
+        ui.notify(e)
+        return
+    finally:
+        full_scan_button.enable()
+    populate_sample_table()
+
+
+def populate_sample_table() -> None:
+    """Shows the estimates of the quick scan, with the exact percentage of the columns which were fully scanned."""
+    columns = [
+        {'name': 'column', 'label': 'Column', 'field': 'column', 'required': True, 'align': 'left'},
+        {'name': 'estimate', 'label': 'Estimated rows', 'field': 'estimate', 'required': True, 'align': 'left'},
+        {'name': 'interval', 'label': f"{DEFAULT_CONFIDENCE:.0%} interval", 'field': 'interval', 'required': True,
+         'align': 'left'},
+        {'name': 'sample', 'label': 'Matches in sample', 'field': 'sample', 'required': True, 'align': 'left'},
+        {'name': 'exact', 'label': 'Exact', 'field': 'exact', 'required': True, 'align': 'left'}
+    ]
+    rows = []
+    sample_rows = 0
+    for col, estimate in fileHandler.sample_estimates.items():
+        sample_rows = estimate['sample_rows']
+        exact = estimate.get('exact')
+        rows.append({'column': col, 'estimate': f"{estimate['share'] * 100:.2f}%",
+                     'interval': f"{estimate['low'] * 100:.2f}% - {estimate['high'] * 100:.2f}%",
+                     'sample': f"{estimate['matching_rows']} / {sample_rows}",
+                     'exact': f"{exact[1]} ({exact[0]} rows)" if exact is not None else ''})
+    quick_scan_label.text = f"{sample_rows:,} records sampled, about {fileHandler.estimated_rows:,} rows in the file."
+    sample_table.columns = columns
+    sample_table.rows = rows
+    sample_table.update()
+
+
+async def validate_click() -> None:
+    if fileHandler.path is None:
+        ui.notify("No file loaded.")
+        return
+    validate_button.disable()
+    try:
+        validation = await fileHandler.validate_file()
+    except Exception as e:
+        ui.notify(e)
+        return
+    finally:
+        validate_button.enable()
+    field_counts = ', '.join(f"{fields} fields: {records:,}" for fields, records in validation['field_counts'])
+    validation_label.text = (f"{validation['records']:,} records on {validation['lines']:,} lines, "
+                             f"{validation['expected_fields']} fields expected ({field_counts}). "
+                             f"{validation['ragged']:,} ragged, {validation['unbalanced_quotes']:,} with unbalanced "
+                             f"quotes, {validation['embedded_newlines']:,} with line breaks within values, "
+                             f"{validation['stray_quotes']:,} with quotes within unquoted values.")
+    show_flagged_page({'page': 1, 'rowsPerPage': DEFAULT_DF_HEAD})
+    flagged_table.set_visibility(validation['bad_records'] > 0)
+
+
+def show_flagged_page(pagination: dict) -> None:
+    """Fills the table of the bad rows with one page, server side like show_data_page."""
+    page_size = pagination['rowsPerPage'] or fileHandler.get_flagged_count() # 0 means all rows in quasar
+    flagged_df = fileHandler.get_flagged_rows(pagination['page'] - 1, page_size)
+    flagged_table.columns = [{'name': col, 'label': col, 'field': col, 'align': 'left'} for col in flagged_df.columns]
+    flagged_table.rows = flagged_df.to_dict('records')
+    flagged_table.pagination = {**pagination, 'rowsNumber': fileHandler.get_flagged_count()}
+    flagged_table.update()
+
+
+async def export_bad_rows_click() -> None:
+    if not fileHandler.get_flagged_count():
+        ui.notify("No bad rows to export, validate the file first.")
+        return
+    target_path = await app.native.main_window.create_file_dialog(allow_multiple=False, dialog_type=webview.FOLDER_DIALOG)
+    if not target_path:
+        return
+    try:
+        exported = await fileHandler.export_flagged_records(target_path[0])
+    except Exception as e:
+        ui.notify(e)
+        return
+    ui.notify(f"Bad rows exported to {exported}.")
+
+
+async def drop_file_and_dataframe() -> None:
     if fileHandler.path is not None:
-        fileHandler.drop_df_and_reset_handler()
+        # running operations stop at their next check, the handler is reset once they are out
+        fileHandler.worker_pool.cancel()
+        await fileHandler.drop_file()
         path_label.text = '--no file chosen--'
         result_table.set_visibility(False)
         data_table.set_visibility(False)
@@ -381,23 +2479,90 @@ def drop_file_and_dataframe() -> None:
         check_character_input.value = DEFAULT_CHAR_TO_CHECK
         file_exp.text = "File:"
         file_exp.update()
+        progress_label.set_visibility(False)
+        sample_table.rows = []
+        quick_scan_label.text = ''
+        validation_label.text = ''
+        flagged_table.set_visibility(False)
     else:
         ui.notify("No file loaded.")
 
 
 def show_data_rows(col_name: str) -> None:
     data_label.text = col_name
-    filtered_df = fileHandler.get_filtered_rows(col_name, DEFAULT_DF_HEAD)
-    data_table.columns = [{'name': col, 'label': col, 'field': col} for col in filtered_df.columns]
-    data_table.rows = filtered_df.to_dict('records')
-    data_table.update()
+    try:
+        show_data_page(col_name, {'page': 1, 'rowsPerPage': DEFAULT_DF_HEAD})
+    except Exception as e:
+        ui.notify(e)
+        return
     data_table.set_visibility(True)
     data_label.set_visibility(True)
     panels.set_value('Data Preview')
     panels.update()
 
 
-if __name__ in ("__main__", "__mp_main__"):
+def update_progress() -> None:
+    """Shows the metrics of the running stage of the fileHandler, called by a timer. The bar is hidden once the stage
+    is done, the label keeps the metrics of the last stage."""
+    if fileHandler.metrics is None:
+        return
+    metrics = fileHandler.metrics.as_dict()
+    text = (f"{metrics['stage']} ({metrics['method'] or '...'}): {metrics['rows']:,} rows, "
+            f"{metrics['bytes_read'] / 1024 ** 2:,.1f} MB, {metrics['rows_per_second'] or 0:,} rows/s, "
+            f"{metrics['elapsed_seconds']:.1f} s")
+    if metrics['done']:
+        progress_bar.set_visibility(False)
+        progress_label.text = f"{text}, failed: {metrics['error']}" if metrics['error'] else f"{text}, done"
+    else:
+        if metrics['fraction'] is None:
+            progress_bar.props('indeterminate')
+        else:
+            progress_bar.props(remove='indeterminate')
+            progress_bar.value = metrics['fraction']
+            text = f"{text}, {metrics['fraction']:.0%}"
+        progress_bar.set_visibility(True)
+        progress_label.text = text
+    if fileHandler.worker_pool.queued:
+        progress_label.text += f", {fileHandler.worker_pool.queued} queued"
+    cancel_button.set_visibility(fileHandler.worker_pool.running_generation is not None)
+    progress_label.set_visibility(True)
+
+
+def cancel_operations() -> None:
+    """Cancels the running and the queued operations of the fileHandler, they stop at their next chunk or column."""
+    if fileHandler.worker_pool.cancel():
+        ui.notify("Cancelling...")
+    else:
+        ui.notify("Nothing to cancel.")
+
+
+def show_data_page(col_name: str, pagination: dict) -> None:
+    """Fills the data table with one page of the matching rows of the column. The table paginates server side: it only
+    holds the rows of the current page and asks for the next one with a request event."""
+    page_size = pagination['rowsPerPage'] or fileHandler.get_match_count(col_name) # 0 means all rows in quasar
+    filtered_df = fileHandler.get_filtered_rows(col_name, pagination['page'] - 1, page_size)
+    data_table.columns = [{'name': str(col), 'label': str(col), 'field': str(col)} for col in filtered_df.columns]
+    data_table.rows = filtered_df.rename(columns=str).to_dict('records')
+    data_table.pagination = {**pagination, 'rowsNumber': fileHandler.get_match_count(col_name)}
+    data_table.update()
+
+
+# the worker processes of the parallel mode (and the native window) import this script as __mp_main__ if they are
+# spawned, as on windows and macos. they only need the functions above, so the ui and its packages are left to the main
+# process, which with reload=False also runs the server.
+if __name__ == "__main__":
+    try:
+        import webview
+    except ImportError:
+        install('pywebview')
+        import webview
+
+    try:
+        from nicegui import ui, app
+    except ImportError:
+        install('nicegui')
+        from nicegui import ui, app
+
     app.on_shutdown(kill_script)  # sys exit is triggered here, for some reason that does not cleanly exit the script.. the script is exited by crashing though
     fileHandler = FileHandler('', '')
 
@@ -412,8 +2577,13 @@ if __name__ in ("__main__", "__mp_main__"):
                 encoding_menu = ui.select(available_encodings, label='File encoding', with_input=True, value=DEFAULT_ENCODING)
                 encoding_menu.bind_value(fileHandler, 'encoding')
                 parsing_engine_menu = ui.select(parsing_engines, label='csv Parsing engine', with_input=True, value=DEFAULT_PARSING_ENGINE)
-                parsing_engine_menu.tooltip("Use c for big csv, use python for anything else.")
+                parsing_engine_menu.tooltip("Use c for big csv, use python for anything else. mmap counts the characters "
+                                            "on the raw file without pandas, data is parsed with c.")
                 parsing_engine_menu.bind_value(fileHandler, 'parsing_engine')
+                string_storage_menu = ui.select(string_storages, label='String storage', value=DEFAULT_STRING_STORAGE)
+                string_storage_menu.tooltip("pyarrow keeps the values in arrow buffers, which needs less memory and "
+                                            "speeds up analyze and swap on big files.")
+                string_storage_menu.bind_value(fileHandler, 'string_storage')
             with ui.row():
                 file_has_headers = ui.checkbox("File has headers", value=True)
                 file_has_headers.on_value_change(lambda e: fileHandler.toggle_header_mode(e.value))
@@ -424,6 +2594,31 @@ if __name__ in ("__main__", "__mp_main__"):
                 delete_linebreaks.bind_value(fileHandler, 'replace_linebreaks')
                 seperator_input = ui.input(label='csv separator', value=',')
                 seperator_input.bind_value(fileHandler, 'seperator')
+                streaming_mode = ui.checkbox("Streaming mode", value=False)
+                streaming_mode.tooltip("Analyze the file chunk by chunk while reading it, the data is not kept in memory. "
+                                       "Use for files which do not fit into memory.")
+                streaming_mode.bind_value(fileHandler, 'streaming_mode')
+                use_cache = ui.checkbox("Use cache", value=False)
+                use_cache.tooltip("Keep parsed files and analysis results on disk, so re-opening a file with the same "
+                                  "settings does not parse it again.")
+                use_cache.bind_value(fileHandler, 'use_cache')
+            with ui.row():
+                parallel_mode = ui.checkbox("Parallel mode", value=False)
+                parallel_mode.tooltip("Split the file into byte ranges which are parsed or analyzed on several cores. "
+                                      "Only for encodings where the separator and line breaks are single bytes.")
+                parallel_mode.bind_value(fileHandler, 'parallel_mode')
+                worker_count_input = ui.number(label='Workers', value=fileHandler.worker_count, min=1, step=1,
+                                               precision=0)
+                worker_count_input.bind_value(fileHandler, 'worker_count')
+                log_metrics = ui.checkbox("Log metrics", value=False)
+                log_metrics.tooltip(f"Append the metrics of every load, analysis and export to {METRICS_LOG_FILE}.")
+                log_metrics.bind_value(fileHandler, 'metrics_log_path',
+                                       forward=lambda value: METRICS_LOG_FILE if value else None,
+                                       backward=lambda path: path is not None)
+                auto_detect_format = ui.checkbox("Auto-detect format", value=True)
+                auto_detect_format.tooltip("Detect encoding, separator and header from the head, middle and tail of "
+                                           "the file when it is chosen. Reload keeps the settings.")
+                auto_detect_format.bind_value(fileHandler, 'auto_detect_format')
             with ui.row():
                 choose_file_button = ui.button('choose file', on_click=load_file_and_set_dataframe)
                 reload_file_Button = ui.button('reload file', on_click=reload_file_and_dataframe)
@@ -446,6 +2641,34 @@ if __name__ in ("__main__", "__mp_main__"):
             loading_spinner_analyzer = ui.spinner(size='lg')
             loading_spinner_analyzer.set_visibility(False)
 
+            with ui.expansion('quick scan').classes('w-full'):
+                with ui.row():
+                    sample_size_input = ui.number(label='Sample size', value=DEFAULT_SAMPLE_SIZE, min=1, step=1000,
+                                                  precision=0)
+                    sample_size_input.bind_value(fileHandler, 'sample_size')
+                    sample_method_menu = ui.select(sample_methods, label='Sampling', value=sample_methods[0])
+                    sample_method_menu.tooltip("stratified picks one record per equally sized part of the file, random "
+                                               "picks them anywhere.")
+                    sample_method_menu.bind_value(fileHandler, 'sample_method')
+                    quick_scan_button = ui.button('quick scan', on_click=quick_scan_click)
+                quick_scan_label = ui.label('')
+                sample_table = ui.table(columns=[], rows=[], row_key='column', selection='multiple')
+                full_scan_button = ui.button('full scan of selected columns', on_click=full_scan_click)
+                full_scan_button.tooltip("Count the selected columns exactly to check the estimates.")
+
+            with ui.expansion('structure check').classes('w-full'):
+                with ui.row():
+                    validate_button = ui.button('validate', on_click=validate_click)
+                    validate_button.tooltip("Check the raw file for ragged rows, unbalanced quotes, line breaks "
+                                            "within values and stray quotes, without loading it.")
+                    export_bad_rows_button = ui.button('export bad rows', on_click=export_bad_rows_click)
+                    export_bad_rows_button.tooltip("Write the ragged rows and the rows with unbalanced quotes to a file "
+                                                   "of their own, below the header.")
+                validation_label = ui.label('')
+                flagged_table = ui.table(columns=[], rows=[], pagination=DEFAULT_DF_HEAD)
+                flagged_table.on('request', lambda e: show_flagged_page(e.args['pagination']), ['pagination'])
+                flagged_table.set_visibility(False)
+
             result_table = ui.table(columns=[], rows=[])
             result_table.add_slot('body-cell-title', r'<td><a :href="props.row.url">{{ props.row.title }}</a></td>')
             result_table.on('rowClick', lambda e: show_data_rows(e.args[1]["column"]))
@@ -453,16 +2676,31 @@ if __name__ in ("__main__", "__mp_main__"):
         with ui.tab_panel(data_view):
             data_label = ui.label('')
             data_label.set_visibility(False)
-            data_table = ui.table(columns=[], rows=[])
+            data_table = ui.table(columns=[], rows=[], pagination=DEFAULT_DF_HEAD)
+            data_table.on('request', lambda e: show_data_page(data_label.text, e.args['pagination']), ['pagination'])
             data_table.set_visibility(False)
         with ui.tab_panel(export_page):
             with ui.row():
                 swap_out_character = ui.input(label='String to swap out', value=DEFAULT_CHAR_TO_CHECK)
                 swap_in_character = ui.input(label='String to swap in', value='@$@$@')
                 export_separator = ui.input(label='Separator', value=DEFAULT_CHAR_TO_CHECK)
+                export_format_menu = ui.select(export_formats, label='Format', value=DEFAULT_EXPORT_FORMAT)
+                export_format_menu.tooltip("csv.gz and csv.zst are compressed csv, parquet and feather columnar files "
+                                           "(the separator is not used). The chunks are compressed on several cores.")
+                export_format_menu.bind_value(fileHandler, 'export_format')
             download_and_swap_button = ui.button('Swap string and save file', on_click=transform_and_save_file)
             export_spinner = ui.spinner(size='lg')
             export_spinner.set_visibility(False)
+    # below the tabs, so the progress is visible on all of them
+    progress_bar = ui.linear_progress(value=0, show_value=False).classes('w-full')
+    progress_bar.set_visibility(False)
+    with ui.row():
+        progress_label = ui.label('')
+        progress_label.set_visibility(False)
+        cancel_button = ui.button('cancel', on_click=cancel_operations)
+        cancel_button.tooltip("Stop the running load, analysis or export and the ones waiting for it.")
+        cancel_button.set_visibility(False)
+    ui.timer(0.5, update_progress)
 
     ui.run(native=True,
            dark=True,
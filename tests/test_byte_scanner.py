@@ -0,0 +1,65 @@
+### The byte scanner of the mmap engine and the validation have to read the same records and values as pd.read_csv.
+### The block size is made small, so quoted values, escaped quotes and line ends are cut at every possible position.
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import CharacterCheckGUI
+from CharacterCheckGUI import (get_byte_dialect, read_csv_header_bytes, iter_csv_records, split_csv_record,
+                               unquote_field, count_chars_in_byte_range, validate_byte_range)
+
+CHECK_CHARS = [',', '"', '\n']
+
+CASES = {
+    'quotes_across_blocks': b'a,b,c\n1,"x,y",2\n3,"a long, quoted, value",4\n5,6,"end"\n"7","8","9"\n',
+    'doubled_quotes': b'a,b\n"say ""hi""",1\n"""",2\n"x""y,z",3\n"""a"",""b""",""""\n',
+    'crlf_in_quotes': b'a,b\r\n"line1\r\nline2",1\r\n2,"x\r\n,y"\r\n"",""\r\n',
+    'no_final_newline': b'a,b\n1,2\n"3,4",5',
+    'no_final_newline_quoted': b'a,b\n1,2\n3,"x\ny"',
+}
+
+
+def read_with_pandas(data: bytes) -> pd.DataFrame:
+    return pd.read_csv(BytesIO(data), dtype=str, keep_default_na=False, engine='c')
+
+
+@pytest.fixture(params=[2, 3, 5, 8, 64], ids=lambda size: f'block_{size}')
+def block_size(request, monkeypatch):
+    monkeypatch.setattr(CharacterCheckGUI, 'BYTE_SCANNER_BLOCK_SIZE', request.param)
+    return request.param
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_records_match_pandas(name, block_size):
+    data = CASES[name]
+    dialect = get_byte_dialect('utf_8', ',')
+    _, field_indices, data_start = read_csv_header_bytes(data, 'utf_8', dialect, 0, False)
+    records = [[unquote_field(field, dialect).decode() for field in split_csv_record(record, dialect)]
+               for _, record in iter_csv_records(data, data_start, len(data), dialect)]
+    assert records == read_with_pandas(data).values.tolist()
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_counts_match_pandas(name, block_size):
+    data = CASES[name]
+    dialect = get_byte_dialect('utf_8', ',')
+    patterns = [char.encode() for char in CHECK_CHARS]
+    expected = read_with_pandas(data)
+    _, field_indices, data_start = read_csv_header_bytes(data, 'utf_8', dialect, 0, False)
+    rows, matches = count_chars_in_byte_range(data, data_start, len(data), dialect, field_indices, patterns, False)
+    assert rows == len(expected)
+    assert [[(len(matches[i][j][0]), matches[i][j][2]) for j in range(len(patterns))] for i in field_indices] == [
+        [(int(expected[column].str.contains(char, regex=False).sum()), int(expected[column].str.count(char).sum()))
+         for char in CHECK_CHARS] for column in expected.columns]
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_validation_matches_pandas(name, block_size):
+    data = CASES[name]
+    dialect = get_byte_dialect('utf_8', ',')
+    _, field_indices, data_start = read_csv_header_bytes(data, 'utf_8', dialect, 0, False)
+    validation = validate_byte_range(data, data_start, len(data), dialect, len(field_indices))
+    assert validation['records'] == len(read_with_pandas(data))
+    assert validation['field_counts'] == {len(field_indices): validation['records']}
+    assert len(validation['issues']) == 0 or not any(validation['issues'] & CharacterCheckGUI.BAD_RECORD_ISSUES)